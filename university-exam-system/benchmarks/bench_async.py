@@ -0,0 +1,90 @@
+"""
+Throughput benchmark for the sync (pymongo) and async (Motor) data layers.
+
+Start the stack once as usual and once with USE_MOTOR=1 set on exam-service
+and response-service, then run this script against each with the same
+arguments and compare the reported requests/second and latencies:
+
+    python benchmarks/bench_async.py --label sync  --student-id student1
+    python benchmarks/bench_async.py --label motor --student-id student1
+
+`--endpoint submit` posts MCQ answers to a live exam instead; every request
+uses a different synthetic student id so submissions do not collide.
+
+Requires `httpx` (pip install httpx).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client, make_request, counter, latencies, errors, deadline):
+    while time.perf_counter() < deadline:
+        n = counter[0]
+        counter[0] += 1
+        started = time.perf_counter()
+        try:
+            res = await make_request(client, n)
+            if res.status_code != 200:
+                errors.append(res.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    base = args.api_url.rstrip("/")
+
+    if args.endpoint == "by-student":
+        async def make_request(client, n):
+            return await client.get(f"{base}/exam/exams/by-student", params={"student_id": args.student_id})
+    else:
+        async def make_request(client, n):
+            return await client.post(
+                f"{base}/response/exams/{args.exam_id}/questions/{args.question_id}/response",
+                params={"student_id": f"bench-{args.label}-{n}"},
+                json={"longAnswerText": "", "marksObtained": 0, "type": "mcq"}
+            )
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        counter, latencies, errors = [0], [], []
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*[
+            worker(client, make_request, counter, latencies, errors, deadline)
+            for _ in range(args.concurrency)
+        ])
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"[{args.label}] {args.endpoint}: {total} requests in {args.duration}s "
+          f"with concurrency {args.concurrency}")
+    print(f"  throughput: {total / args.duration:.1f} req/s, errors: {len(errors)}")
+    if latencies:
+        print(f"  latency p50: {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95: {latencies[int(total * 0.95) - 1] * 1000:.1f} ms, "
+              f"max: {latencies[-1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://localhost")
+    parser.add_argument("--endpoint", choices=["by-student", "submit"], default="by-student")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--student-id", default="student1")
+    parser.add_argument("--exam-id", default="phys1-quiz")
+    parser.add_argument("--question-id")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30)
+    args = parser.parse_args()
+
+    if args.endpoint == "submit" and not args.question_id:
+        parser.error("--question-id is required for --endpoint submit")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
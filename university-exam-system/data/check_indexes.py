@@ -0,0 +1,54 @@
+"""
+Compares the indexes in the `university` database against data/indexes.json.
+
+Prints every manifest index that is missing and every existing index that has
+not been used since the server started (from $indexStats).
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python data/check_indexes.py
+"""
+from pymongo import MongoClient
+import json
+import os
+
+MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes.json")
+
+def main():
+    client = MongoClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client.university
+
+    with open(MANIFEST) as f:
+        manifest = json.load(f)
+
+    missing = []
+    unused = []
+    for collection_name in sorted(set(manifest) | set(db.list_collection_names())):
+        existing = {
+            tuple(tuple(k) for k in info["key"]): name
+            for name, info in db[collection_name].index_information().items()
+        }
+        for spec in manifest.get(collection_name, []):
+            keys = tuple((field, direction) for field, direction in spec["keys"])
+            if keys not in existing:
+                missing.append((collection_name, keys))
+
+        if collection_name not in db.list_collection_names():
+            continue
+        for stats in db[collection_name].aggregate([{"$indexStats": {}}]):
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                unused.append((collection_name, stats["name"]))
+
+    print("Missing indexes:")
+    for collection_name, keys in missing:
+        print(f"  {collection_name}: {', '.join(f'{field} {direction}' for field, direction in keys)}")
+    if not missing:
+        print("  (none)")
+
+    print("Unused indexes (no operations since server start):")
+    for collection_name, name in unused:
+        print(f"  {collection_name}: {name}")
+    if not unused:
+        print("  (none)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Removes duplicate responses so the unique (examId, studentId, id) index from
+data/indexes.json can be built.
+
+Duplicates come from retried submissions before submission became an upsert.
+For every (exam, student, question) with more than one response, the first
+graded response is kept (or the earliest one if none is graded) and the rest
+are deleted in batches. The running totals of affected students are reduced
+by what the deleted copies had added, then the unique index is created.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python data/dedupe_responses.py [--batch-size 1000] [--dry-run]
+"""
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+from collections import defaultdict
+from datetime import datetime
+import argparse
+import os
+
+def find_duplicates(db):
+    # Sorting on _id first makes each group's ids come out oldest first
+    return db.responses.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {"examId": "$examId", "studentId": "$studentId", "id": "$id"},
+            "responses": {"$push": {"_id": "$_id", "marksAwarded": "$marksAwarded"}},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+def flush(db, delete_ids, adjustments, dry_run):
+    if dry_run or not delete_ids:
+        return
+    db.responses.delete_many({"_id": {"$in": delete_ids}})
+
+    question_ids = list({question_id for _, _, question_id in adjustments})
+    question_marks = {
+        q["_id"]: q.get("marks", 0)
+        for q in db.questions.find({"_id": {"$in": question_ids}}, {"marks": 1})
+    }
+    totals = defaultdict(lambda: {"marksObtained": 0, "totalMarks": 0, "answered": 0})
+    for (student_id, exam_id, question_id), (count, marks) in adjustments.items():
+        total = totals[(student_id, exam_id)]
+        total["marksObtained"] -= marks
+        total["totalMarks"] -= question_marks.get(question_id, 0) * count
+        total["answered"] -= count
+    db.running_totals.bulk_write([
+        UpdateOne(
+            {"studentId": student_id, "examId": exam_id},
+            {"$inc": inc, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        for (student_id, exam_id), inc in totals.items()
+    ], ordered=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate responses before adding the unique response index")
+    parser.add_argument("--batch-size", type=int, default=1000, help="responses to delete per batch")
+    parser.add_argument("--dry-run", action="store_true", help="report duplicates without deleting them")
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client.university
+
+    groups = 0
+    deleted = 0
+    delete_ids = []
+    adjustments = defaultdict(lambda: [0, 0])
+    for group in find_duplicates(db):
+        responses = group["responses"]
+        keep = next((r for r in responses if r.get("marksAwarded") is not None), responses[0])
+        key = (group["_id"]["studentId"], group["_id"]["examId"], group["_id"]["id"])
+        for response in responses:
+            if response is keep:
+                continue
+            delete_ids.append(response["_id"])
+            adjustments[key][0] += 1
+            adjustments[key][1] += response.get("marksAwarded") or 0
+        groups += 1
+
+        if len(delete_ids) >= args.batch_size:
+            flush(db, delete_ids, adjustments, args.dry_run)
+            deleted += len(delete_ids)
+            print(f"{'Would delete' if args.dry_run else 'Deleted'} {deleted} duplicate responses so far")
+            delete_ids = []
+            adjustments = defaultdict(lambda: [0, 0])
+
+    flush(db, delete_ids, adjustments, args.dry_run)
+    deleted += len(delete_ids)
+    print(f"{groups} answers had duplicates; {'would delete' if args.dry_run else 'deleted'} {deleted} responses")
+
+    if args.dry_run:
+        return
+    try:
+        db.responses.create_index([("examId", 1), ("studentId", 1), ("id", 1)], unique=True)
+        print("Unique response index is in place")
+    except OperationFailure as e:
+        # New duplicates can only slip in from services still running the old insert path
+        print(f"Could not create the unique response index: {e}")
+
+if __name__ == "__main__":
+    main()
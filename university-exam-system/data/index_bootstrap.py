@@ -0,0 +1,30 @@
+"""
+Applies data/indexes.json at service startup.
+
+docker-compose mounts this module and the manifest next to each Mongo-backed
+service's main.py. Every service passes the collections it owns, so each
+index is created, and any failure reported, by exactly one service.
+"""
+from pymongo.errors import OperationFailure, PyMongoError
+import json
+import os
+
+def apply_index_manifest(db, collections):
+    path = os.getenv("INDEX_MANIFEST", os.path.join(os.path.dirname(os.path.abspath(__file__)), "indexes.json"))
+    if not os.path.exists(path):
+        print(f"Index manifest not found at {path}; skipping index bootstrap")
+        return
+    with open(path) as f:
+        manifest = json.load(f)
+    for collection_name in collections:
+        for spec in manifest.get(collection_name, []):
+            keys = [(field, direction) for field, direction in spec["keys"]]
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                db[collection_name].create_index(keys, **options)
+            except OperationFailure as e:
+                print(f"Could not create index {keys} on {collection_name}: {e}")
+            except PyMongoError as e:
+                # Mongo not reachable yet; the next restart applies the manifest
+                print(f"Skipping index bootstrap, MongoDB unavailable: {e}")
+                return
@@ -144,61 +144,61 @@ elif page == "📝 Attempt Exam":
                 }) or []
 
                 attempted_ids = [r["id"] for r in responses]
-                exam_questions = fetch_data(f"{API_URL}/exam/exams/{exam['exam_id']}/questions") or []
+                exam_questions = fetch_data(f"{API_URL}/questions/exams/{exam['exam_id']}/questions") or []
 
                 if len(attempted_ids) == len(exam_questions):
                     st.success("✅ Exam Attempted Successfully!")
                     continue
 
+                pending = []
                 for q in exam_questions:
                     if q["id"] in attempted_ids:
                         st.success(f"✅ Already answered: {q['questionText']}")
-                        continue
+                    else:
+                        pending.append(q)
 
-                    with st.form(key=f"{q['id']}"):
+                # All remaining answers go to the server in one request
+                with st.form(key=f"exam_{exam['exam_id']}"):
+                    answers = {}
+                    for q in pending:
                         st.markdown(f"**Q: {q['questionText']}**")
                         st.markdown(f"_({q['marks']} marks)_")
 
                         if q["type"] == "mcq":
                             options = q.get("options", [])
-                            selected = st.radio("Choose your answer:", options, key=f"radio_{q['id']}")
-                            submitted = st.form_submit_button("Submit")
-                            if submitted:
-                                try:
-                                    index = options.index(selected)
-                                    res = requests.post(
-                                        f"{API_URL}/exam/exams/{exam['exam_id']}/questions/{q['id']}/response",
-                                        params={"student_id": st.session_state.student_id},
-                                        json={
-                                            "marksObtained": index,  # misuse field to send index
-                                            "type": "mcq"
-                                        }
-                                    )
-                                    if res.status_code == 200:
-                                        st.success("Answer submitted!")
-                                        st.rerun()
-                                    else:
-                                        st.error(f"Submission failed: {res.text}")
-                                except Exception as e:
-                                    st.error(f"Error: {e}")
-
+                            answers[q["id"]] = st.radio("Choose your answer:", options, key=f"radio_{q['id']}", index=None)
                         elif q["type"] == "long":
-                            answer_text = st.text_area("Your answer:", key=f"long_{q['id']}")
-                            submitted = st.form_submit_button("Submit")
-                            if submitted:
+                            answers[q["id"]] = st.text_area("Your answer:", key=f"long_{q['id']}")
+
+                    submitted = st.form_submit_button("Submit Answers")
+                    if submitted:
+                        payload = []
+                        for q in pending:
+                            answer = answers.get(q["id"])
+                            if q["type"] == "mcq" and answer is not None:
+                                payload.append({
+                                    "questionId": q["id"],
+                                    "type": "mcq",
+                                    "selectedAnswerIndex": q.get("options", []).index(answer)
+                                })
+                            elif q["type"] == "long" and answer:
+                                payload.append({"questionId": q["id"], "type": "long", "longAnswerText": answer})
+
+                        if not payload:
+                            st.warning("Please answer at least one question.")
+                        else:
+                            try:
                                 res = requests.post(
-                                    f"{API_URL}/exam/exams/{exam['exam_id']}/questions/{q['id']}/response",
-                                    params={"student_id": st.session_state.student_id},
-                                    json={
-                                        "longAnswerText": answer_text,
-                                        "type": "long"
-                                    }
+                                    f"{API_URL}/response/exams/{exam['exam_id']}/responses:batch",
+                                    json={"studentId": st.session_state.student_id, "answers": payload}
                                 )
                                 if res.status_code == 200:
-                                    st.success("Answer submitted!")
+                                    st.success(f"{len(payload)} answer(s) submitted!")
                                     st.rerun()
                                 else:
-                                    st.error("Submission failed.")
+                                    st.error(f"Submission failed: {res.text}")
+                            except Exception as e:
+                                st.error(f"Error: {e}")
 
 
 
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import time
 
 API_URL = "http://nginx/"
+EVALUATION_PAGE_SIZE = 20  # Long answers shown per page while evaluating
 
 st.set_page_config(page_title="Teacher Portal", page_icon="👩‍🏫", layout="wide")
 st.title("👩‍🏫 Teacher Portal")
@@ -353,6 +354,24 @@ def evaluate_exam():
         st.info("No questions found for this exam.")
         return
 
+    # Answer distribution for every MCQ in one request
+    mcq_distribution = {}
+    if any(q["type"] == "mcq" for q in questions):
+        mcq_distribution = fetch_data(f"{API_URL}/response/exams/{exam_id}/mcq-distribution") or {}
+
+    if any(q["type"] == "long" for q in questions):
+        st.caption("Suggested marks for long answers appear once the exam has been auto-scored.")
+        if st.button("🤖 Auto-score ungraded answers"):
+            try:
+                with st.spinner("Scoring answers against the expected keywords..."):
+                    res = requests.post(f"{API_URL}/response/exams/{exam_id}/auto-score")
+                if res.status_code == 200:
+                    st.success(f"Suggested marks for {res.json()['scored']} answer(s).")
+                else:
+                    st.error("Auto-scoring failed.")
+            except Exception as e:
+                st.error(f"Error auto-scoring: {e}")
+
     for question in questions:
         st.markdown("---")
         st.subheader(f"📖 {question['questionText']} _(Max Marks: {question['marks']})_")
@@ -360,20 +379,57 @@ def evaluate_exam():
         if question["type"] == "long":
             st.markdown(f"**Expected Keywords:** {', '.join(question.get('expectedKeywords', []))}")
 
+            # One page of summaries at a time; answer bodies are fetched for that page only
+            page_key = f"eval_pages_{question['id']}"
+            pages = st.session_state.setdefault(page_key, [None])  # Cursor at the start of each page visited
+            show = st.radio(
+                "Show",
+                ["Ungraded", "Graded", "All"],
+                horizontal=True,
+                key=f"eval_filter_{question['id']}",
+                on_change=lambda key=page_key: st.session_state.update({key: [None]})
+            )
+            params = {
+                "exam_id": exam_id,
+                "question_id": question["id"],
+                "summary": True,
+                "limit": EVALUATION_PAGE_SIZE
+            }
+            if show != "All":
+                params["graded"] = show == "Graded"
+            if pages[-1]:
+                params["after"] = pages[-1]
+
             try:
-                res = requests.get(
-                    f"{API_URL}/response/exams/question-responses",
-                    params={"exam_id": exam_id, "question_id": question["id"]}
-                )
+                res = requests.get(f"{API_URL}/response/exams/question-responses", params=params)
                 if res.status_code == 200:
                     responses = res.json().get("responses", [])
+                    next_after = res.headers.get("X-Next-After")
                 else:
                     st.error("Failed to fetch long responses.")
                     continue
+                answers = {}
+                if responses:
+                    answers = fetch_data(
+                        f"{API_URL}/response/responses/answers",
+                        params={"response_ids": [resp["responseId"] for resp in responses]}
+                    ) or {}
             except Exception as e:
                 st.error(f"Error fetching long responses: {e}")
                 continue
 
+            for resp in responses:
+                resp["longAnswerText"] = answers.get(resp["responseId"], "")
+
+            prev_col, page_col, next_col = st.columns([1, 2, 1])
+            if len(pages) > 1 and prev_col.button("← Previous", key=f"eval_prev_{question['id']}"):
+                pages.pop()
+                st.rerun()
+            page_col.caption(f"Page {len(pages)}")
+            if next_after and next_col.button("Next →", key=f"eval_next_{question['id']}"):
+                pages.append(next_after)
+                st.rerun()
+
             marks_to_submit = {}
             any_ungraded = False
 
@@ -390,10 +446,15 @@ def evaluate_exam():
                             st.write(f"**Graded At:** {format_datetime(resp['gradedAt'])}")
                     else:
                         any_ungraded = True
+                        suggested = resp.get("suggestedMarks")
+                        if suggested is not None:
+                            matched = ", ".join(resp.get("matchedKeywords", [])) or "none"
+                            st.info(f"Suggested: {suggested} / {question['marks']} (keywords found: {matched})")
                         marks_awarded = st.number_input(
                             f"Marks for {resp['studentId']}",
                             min_value=0,
                             max_value=question["marks"],
+                            value=min(suggested or 0, question["marks"]),
                             key=f"mark_{resp['responseId']}"
                         )
                         marks_to_submit[resp["responseId"]] = marks_awarded
@@ -401,75 +462,82 @@ def evaluate_exam():
             if any_ungraded:
                 if st.button(f"✅ Submit Marks for '{question['questionText']}'"):
                     success = True
-                    for rid, marks in marks_to_submit.items():
-                        payload = {
-                            "marks": marks,
-                            "gradedBy": st.session_state.teacher_id
-                        }
-                        try:
-                            res = requests.post(
-                                f"{API_URL}/response/responses/grade",
-                                params={"response_id": rid},
-                                json=payload
-                            )
-                            if res.status_code != 200:
-                                success = False
-                        except Exception as e:
-                            st.error(f"Error submitting marks: {e}")
+                    payload = {
+                        "gradedBy": st.session_state.teacher_id,
+                        "grades": [{"response_id": rid, "marks": marks} for rid, marks in marks_to_submit.items()]
+                    }
+                    conflicts = 0
+                    try:
+                        res = requests.post(f"{API_URL}/response/responses/grade:bulk", json=payload)
+                        if res.status_code != 200 or res.json().get("failed"):
                             success = False
+                            if res.status_code == 200:
+                                conflicts = res.json().get("conflicts", 0)
+                    except Exception as e:
+                        st.error(f"Error submitting marks: {e}")
+                        success = False
 
                     if success:
                         st.success("All marks submitted!")
                         st.rerun()
+                    elif conflicts:
+                        st.warning(f"{conflicts} answer(s) were graded by someone else meanwhile. Reload to see their marks.")
                     else:
                         st.error("Some marks failed to submit.")
 
         elif question["type"] == "mcq":
             st.write("### 📊 MCQ Responses")
-            try:
-                res = requests.get(
-                    f"{API_URL}/response/exams/question-responses/all",
-                    params={"exam_id": exam_id, "question_id": question["id"]}
-                )
-                if res.status_code == 200:
-                    responses = res.json().get("responses", [])
-                else:
-                    st.error("Failed to fetch MCQ responses.")
-                    continue
-            except Exception as e:
-                st.error(f"Error fetching MCQs: {e}")
+            stats = mcq_distribution.get(question["id"])
+            if not stats or not stats["totalResponses"]:
+                st.info("No responses yet.")
                 continue
 
-            for resp in responses:
-                selected_index = resp.get("selectedAnswerIndex")
-                correct_index = question.get("correctAnswerIndex")
-                options = question.get("options", [])
-
-                selected_option = options[selected_index] if 0 <= selected_index < len(options) else "Invalid"
-                correct_option = options[correct_index] if 0 <= correct_index < len(options) else "Invalid"
-
-                st.markdown(f"""
-                - 🧑 **Student:** `{resp['studentId']}`
-                - ✅ **Selected Option:** {selected_option}
-                - 🎯 **Correct Option:** {correct_option}
-                - 🏅 **Marks Awarded:** {resp.get('marksAwarded', 0)} / {question['marks']}
-                """)
+            total = stats["totalResponses"]
+            correct_index = question.get("correctAnswerIndex")
+            lines = []
+            for index, option in enumerate(question.get("options", [])):
+                count = stats["counts"].get(str(index), 0)
+                bar = "█" * round(20 * count / total)
+                mark = " ✅" if index == correct_index else ""
+                lines.append(f"- `{bar:<20}` **{count}** ({100 * count / total:.0f}%) — {option}{mark}")
+            st.markdown("\n".join(lines))
+            st.caption(f"{total} response(s), {stats['percentCorrect']}% correct")
 
     st.markdown("## 🧮 Finalize Evaluation")
     if st.button("📊 Compute Final Results"):
         try:
             res = requests.post(
                 f"{API_URL}/exam/exams/finalize-results",
-                params={"exam_id": exam_id}
+                params={"exam_id": exam_id, "background": True}
             )
-            if res.status_code == 200:
+            if res.status_code != 200:
+                st.error("Failed to compute results.")
+                return
+
+            # Poll the background job until it finishes
+            job_id = res.json()["jobId"]
+            progress = st.progress(0.0, text="Computing results...")
+            while True:
+                job = fetch_data(f"{API_URL}/exam/jobs/{job_id}")
+                if not job:
+                    st.error("Lost track of the result computation job.")
+                    return
+                if job["status"] in ("completed", "failed"):
+                    break
+                done = job["processed"] / job["total"] if job["total"] else 0.0
+                eta = f" (about {job['etaSeconds']:.0f}s left)" if job.get("etaSeconds") is not None else ""
+                progress.progress(min(done, 1.0), text=f"Processed {job['processed']} / {job['total']} students{eta}")
+                time.sleep(1)
+
+            if job["status"] == "completed":
+                progress.progress(1.0, text="Done")
                 st.success("Results computed successfully!")
                 time.sleep(1.5)  # 1.5 second delay
                 st.session_state.current_view = "home"
                 st.session_state.pop("exam_details", None)
                 st.rerun()
             else:
-                st.error("Failed to compute results.")
+                st.error(f"Failed to compute results: {job.get('error')}")
         except Exception as e:
             st.error(f"Error finalizing: {e}")
 
@@ -645,8 +713,8 @@ elif page == "🏠 Home" and st.session_state.current_view == "home":
         # Display header for selected class and subject
         st.header(f"👥 {class_name} ({class_id}) - {subject['name']}")
 
-        # Fetching students data
-        students = fetch_data(f"{API_URL}/classes/students/by-class", params={"class_id": class_id})
+        # Fetching every student's results for this subject in one call
+        students = fetch_data(f"{API_URL}/exam/results/by-class", params={"class_id": class_id, "subject_id": subject['id']})
 
         if not students:
             st.info("No students found.")
@@ -654,8 +722,7 @@ elif page == "🏠 Home" and st.session_state.current_view == "home":
             st.subheader("🎓 Student Results")
             
             for student in students:
-                # Fetching individual student results using student_id and subject_id
-                student_results = fetch_data(f"{API_URL}/exam/results", params={"student_id": student['id'], "subject_id": subject['id']}) or []
+                student_results = student.get("results", [])
 
                 with st.expander(f"👤 {student['name']} ({student['rollNumber']})"):
                     if student_results:
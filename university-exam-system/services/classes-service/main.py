@@ -1,9 +1,17 @@
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import re
 import uvicorn
 
+try:
+    from index_bootstrap import apply_index_manifest  # Mounted by docker-compose with data/indexes.json
+except ImportError:
+    apply_index_manifest = None
+
+
 # MongoDB Setup
 mongo_url = os.getenv("MONGO_URL", "mongodb://mongodb:27017")
 client = MongoClient(mongo_url)
@@ -16,17 +24,48 @@ questions_collection = db.questions
 classes_collection = db.classes
 responses_collection = db.responses
 results_collection = db.results
+counters_collection = db.counters
 
 app = FastAPI()
 
+# Collections whose manifest indexes this service maintains (see data/index_bootstrap.py)
+INDEX_COLLECTIONS = ("subjects", "classes")
+
+@app.on_event("startup")
+def ensure_indexes():
+    if apply_index_manifest is None:
+        print("index_bootstrap.py is not mounted; skipping index bootstrap")
+        return
+    apply_index_manifest(db, INDEX_COLLECTIONS)
+
+def reserve_ids(counter: str, collection, prefix: str):
+    # Atomically claims the next sequence number for IDs of the form <prefix><n>
+    update = {"$inc": {"seq": 1}}
+    doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    if doc is None:
+        # First use of this counter: continue after the highest ID that already exists
+        pattern = re.compile(f"^{re.escape(prefix)}(\\d+)$")
+        existing = 0
+        for d in collection.find({"_id": {"$regex": pattern.pattern}}, {"_id": 1}):
+            existing = max(existing, int(pattern.match(d["_id"]).group(1)))
+        try:
+            counters_collection.insert_one({"_id": counter, "seq": existing})
+        except DuplicateKeyError:
+            pass
+        doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    return doc["seq"]
+
 class SubjectAssignment(BaseModel):
     teacher_id: str
 
+def bump_subjects_version():
+    # Lets other services invalidate their cached subject names
+    db.config.update_one({"_id": "subjects_version"}, {"$inc": {"version": 1}}, upsert=True)
+
 @app.post("/subjects")
 def create_subject(subject_name: str, subject_code: str):
     base_id = subject_code.lower()
-    existing = list(subjects_collection.find({"_id": {"$regex": f"^{base_id}"}}))
-    subject_id = f"{base_id}{len(existing) + 1}"
+    subject_id = f"{base_id}{reserve_ids(f'subjects:{base_id}', subjects_collection, base_id)}"
 
     if subjects_collection.find_one({"_id": subject_id}) or subjects_collection.find_one({"name": subject_name}):
         raise HTTPException(status_code=400, detail="Subject already exists")
@@ -38,6 +77,7 @@ def create_subject(subject_name: str, subject_code: str):
         "teacherIds": []
     }
     subjects_collection.insert_one(subject)
+    bump_subjects_version()
     return {"message": f"Subject '{subject_name}' created with ID '{subject_id}'!"}
 
 @app.post("/classes")
@@ -80,6 +120,7 @@ def delete_subject(subject_id: str):
     if not subjects_collection.find_one({"_id": subject_id}):
         raise HTTPException(status_code=404, detail="Subject not found")
     subjects_collection.delete_one({"_id": subject_id})
+    bump_subjects_version()
     return {"message": "Subject deleted successfully!"}
 
 @app.get("/students/by-class")
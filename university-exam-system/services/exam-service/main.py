@@ -1,11 +1,36 @@
-from fastapi import FastAPI, HTTPException, Query, Path, Request
+from fastapi import FastAPI, HTTPException, Query, Path, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Optional
-from pymongo import MongoClient
-from datetime import datetime
+from typing import Literal, Optional
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from bson import ObjectId
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import csv
+import heapq
+import io
+import itertools
+import json
+import numpy as np
 import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+import re
+import tempfile
+import threading
+import time
+import uuid
 import uvicorn
 
+try:
+    from index_bootstrap import apply_index_manifest  # Mounted by docker-compose with data/indexes.json
+except ImportError:
+    apply_index_manifest = None
+
+
 # MongoDB Setup
 mongo_url = os.getenv("MONGO_URL", "mongodb://mongodb:27017")
 client = MongoClient(mongo_url)
@@ -18,20 +43,337 @@ questions_collection = db.questions
 classes_collection = db.classes
 responses_collection = db.responses
 results_collection = db.results
+counters_collection = db.counters
+running_totals_collection = db.running_totals
+jobs_collection = db.jobs
+exam_events_collection = db.exam_events
+exam_stats_collection = db.exam_stats
+
+# Opt-in async data layer for the hottest read path (see benchmarks/bench_async.py)
+USE_MOTOR = os.getenv("USE_MOTOR", "0") == "1"
+if USE_MOTOR:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    motor_db = AsyncIOMotorClient(mongo_url).university
+
+FINALIZE_BATCH_SIZE = int(os.getenv("FINALIZE_BATCH_SIZE", "500"))
+ENROLLMENT_CACHE_SIZE = int(os.getenv("ENROLLMENT_CACHE_SIZE", "10000"))
+ENROLLMENT_CACHE_TTL = float(os.getenv("ENROLLMENT_CACHE_TTL", "300"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+GRADE_CONFIG_RECHECK_SECONDS = float(os.getenv("GRADE_CONFIG_RECHECK_SECONDS", "5"))
+ENROLLMENT_VERSION_RECHECK_SECONDS = float(os.getenv("ENROLLMENT_VERSION_RECHECK_SECONDS", "5"))
+SCHEDULER_RESYNC_SECONDS = float(os.getenv("SCHEDULER_RESYNC_SECONDS", "60"))
+WARMUP_LEAD_SECONDS = float(os.getenv("WARMUP_LEAD_SECONDS", "60"))
+finalize_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FINALIZE_WORKERS", "2")))
 
 app = FastAPI()
 
+# Collections whose manifest indexes this service maintains (see data/index_bootstrap.py)
+INDEX_COLLECTIONS = ("exams", "exam_events", "results", "jobs")
+
+@app.on_event("startup")
+def ensure_indexes():
+    if apply_index_manifest is None:
+        print("index_bootstrap.py is not mounted; skipping index bootstrap")
+        return
+    apply_index_manifest(db, INDEX_COLLECTIONS)
+
+def reserve_ids(counter: str, collection, prefix: str):
+    # Atomically claims the next sequence number for IDs of the form <prefix><n>
+    update = {"$inc": {"seq": 1}}
+    doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    if doc is None:
+        # First use of this counter: continue after the highest ID that already exists
+        pattern = re.compile(f"^{re.escape(prefix)}(\\d+)$")
+        existing = 0
+        for d in collection.find({"_id": {"$regex": pattern.pattern}}, {"_id": 1}):
+            existing = max(existing, int(pattern.match(d["_id"]).group(1)))
+        try:
+            counters_collection.insert_one({"_id": counter, "seq": existing})
+        except DuplicateKeyError:
+            pass
+        doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    return doc["seq"]
+
+class TTLCache:
+    # Small thread-safe LRU whose entries also expire after `ttl` seconds
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+@app.on_event("startup")
+def fail_interrupted_jobs():
+    # Jobs that were in flight when the service stopped will never finish
+    try:
+        jobs_collection.update_many(
+            {"status": {"$in": ["queued", "running"]}},
+            {"$set": {"status": "failed", "error": "Interrupted by service restart", "finishedAt": datetime.utcnow()}}
+        )
+    except PyMongoError as e:
+        print(f"Could not mark interrupted jobs as failed: {e}")
+
 class ExamStatusUpdate(BaseModel):
     status: str
 
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def ndjson_stream(docs):
+    for doc in docs:
+        yield json.dumps(doc, default=json_default) + "\n"
+
+def wants_ndjson(request: Request):
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+def keyset_page(collection, query: dict, limit: Optional[int], after=None, projection=None):
+    # Keyset pagination on _id: pass the last _id of a page as `after` to get the next one
+    if after is not None:
+        query = {**query, "_id": {"$gt": after}}
+    cursor = collection.find(query, projection).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+def list_response(request: Request, response: Response, cursor, formatter, limit: Optional[int]):
+    if wants_ndjson(request):
+        return StreamingResponse(ndjson_stream(formatter(doc) for doc in cursor), media_type="application/x-ndjson")
+    docs = list(cursor)
+    if limit and len(docs) == limit:
+        response.headers["X-Next-After"] = str(docs[-1]["_id"])
+    return [formatter(doc) for doc in docs]
+
+# Subject names rarely change; classes-service bumps config.subjects_version
+# whenever a subject is created or deleted so we know when to drop the cache.
+subject_name_cache = {"version": None, "names": {}}
+
+def get_subject_names(subject_ids):
+    marker = db.config.find_one({"_id": "subjects_version"}, {"version": 1}) or {}
+    version = marker.get("version", 0)
+    if version != subject_name_cache["version"]:
+        subject_name_cache["version"] = version
+        subject_name_cache["names"] = {}
+
+    names = subject_name_cache["names"]
+    missing = [sid for sid in set(subject_ids) if sid not in names]
+    if missing:
+        for s in subjects_collection.find({"_id": {"$in": missing}}, {"name": 1}):
+            names[s["_id"]] = s.get("name")
+    return names
+
+# user-service bumps config.enrollment_version whenever a student is created or removed.
+# The version is only compared every few seconds so a cache hit needs no round trip.
+enrollment_cache = TTLCache(ENROLLMENT_CACHE_SIZE, ENROLLMENT_CACHE_TTL)
+enrollment_cache_version = {"version": None, "checkedAt": float("-inf")}
+
+def enrollment_version_due():
+    return time.monotonic() - enrollment_cache_version["checkedAt"] >= ENROLLMENT_VERSION_RECHECK_SECONDS
+
+def check_enrollment_version(marker):
+    version = (marker or {}).get("version", 0)
+    if version != enrollment_cache_version["version"]:
+        enrollment_cache_version["version"] = version
+        enrollment_cache.clear()
+    enrollment_cache_version["checkedAt"] = time.monotonic()
+
 def get_student_courses(student_id: str):
-    student = students_collection.find_one({"_id": student_id})
+    if enrollment_version_due():
+        check_enrollment_version(db.config.find_one({"_id": "enrollment_version"}, {"version": 1}))
+
+    subject_ids = enrollment_cache.get(student_id)
+    if subject_ids is not None:
+        return subject_ids
+
+    student = students_collection.find_one({"_id": student_id}, {"classId": 1})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    myclass = student['classId']
-    my_class_object = classes_collection.find_one({"_id": myclass})
-    print(my_class_object['subjectIds'])
-    return my_class_object['subjectIds']
+    my_class_object = classes_collection.find_one({"_id": student["classId"]}, {"subjectIds": 1})
+    subject_ids = my_class_object["subjectIds"]
+    enrollment_cache.set(student_id, subject_ids)
+    return subject_ids
+
+async def get_student_courses_async(student_id: str):
+    if enrollment_version_due():
+        check_enrollment_version(await motor_db.config.find_one({"_id": "enrollment_version"}, {"version": 1}))
+
+    subject_ids = enrollment_cache.get(student_id)
+    if subject_ids is not None:
+        return subject_ids
+
+    student = await motor_db.students.find_one({"_id": student_id}, {"classId": 1})
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    my_class_object = await motor_db.classes.find_one({"_id": student["classId"]}, {"subjectIds": 1})
+    subject_ids = my_class_object["subjectIds"]
+    enrollment_cache.set(student_id, subject_ids)
+    return subject_ids
+
+def as_datetime(value):
+    # Exam times are stored and compared as naive local time (the scheduler and
+    # response-service both use datetime.now()); aware values are converted to it
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+def publish_exam_transition(exam_id: str, old_status: Optional[str], new_status: str):
+    # Other services follow exam_events to react to status changes
+    exam_events_collection.insert_one({
+        "examId": exam_id,
+        "type": "status",
+        "from": old_status,
+        "to": new_status,
+        "at": datetime.utcnow()
+    })
+
+def warm_exam_caches(exam_id: str):
+    # Preload enrollment for every student who is about to sit the exam
+    exam = exams_collection.find_one({"_id": exam_id}, {"subjectId": 1})
+    if not exam:
+        return
+    classes = classes_collection.find({"subjectIds": exam["subjectId"]}, {"subjectIds": 1})
+    subjects_by_class = {c["_id"]: c["subjectIds"] for c in classes}
+    for s in students_collection.find({"classId": {"$in": list(subjects_by_class)}}, {"classId": 1}):
+        enrollment_cache.set(s["_id"], subjects_by_class[s["classId"]])
+
+# Scheduled exams go live at startTime; live exams move to evaluation at endTime
+# so teachers can grade them before finalize marks them ended.
+EXAM_TRANSITIONS = {"start": ("scheduled", "live"), "end": ("live", "evaluation")}
+
+class ExamScheduler:
+    def __init__(self):
+        self.heap = []
+        self.warmed = set()
+        self.cond = threading.Condition()
+        self.last_sync = float("-inf")
+        self.scheduled_during_sync = None  # Collects schedule() calls while resync reads Mongo
+
+    def events_for(self, exam):
+        start = as_datetime(exam.get("startTime"))
+        end = as_datetime(exam.get("endTime"))
+        events = []
+        if exam.get("status") == "scheduled" and start:
+            if exam["_id"] not in self.warmed:
+                events.append((start - timedelta(seconds=WARMUP_LEAD_SECONDS), "warm", exam["_id"]))
+            events.append((start, "start", exam["_id"]))
+        if exam.get("status") in ("scheduled", "live") and end:
+            events.append((end, "end", exam["_id"]))
+        return events
+
+    def schedule(self, exam):
+        with self.cond:
+            for event in self.events_for(exam):
+                if not isinstance(event[0], datetime):
+                    print(f"Exam scheduler skipped {event[1]} for {event[2]}: no usable time")
+                    continue
+                heapq.heappush(self.heap, event)
+                if self.scheduled_during_sync is not None:
+                    self.scheduled_during_sync.append(event)
+            self.cond.notify()
+
+    def resync(self):
+        # Picks up exams created or changed by other replicas or directly in Mongo.
+        # Events scheduled while the snapshot is read are carried over, not lost;
+        # firing one twice is harmless because transitions are conditional updates.
+        with self.cond:
+            self.scheduled_during_sync = []
+        try:
+            exams = exams_collection.find(
+                {"status": {"$in": ["scheduled", "live"]}},
+                {"status": 1, "startTime": 1, "endTime": 1}
+            )
+            heap = [event for exam in exams for event in self.events_for(exam)]
+        except Exception:
+            with self.cond:
+                self.scheduled_during_sync = None
+            raise
+        with self.cond:
+            heap.extend(self.scheduled_during_sync)
+            self.scheduled_during_sync = None
+            heapq.heapify(heap)
+            self.heap = heap
+        self.last_sync = time.monotonic()
+
+    def fire(self, action: str, exam_id: str):
+        if action == "warm":
+            self.warmed.add(exam_id)
+            warm_exam_caches(exam_id)
+            return
+        old_status, new_status = EXAM_TRANSITIONS[action]
+        result = exams_collection.update_one({"_id": exam_id, "status": old_status}, {"$set": {"status": new_status}})
+        if result.modified_count:
+            publish_exam_transition(exam_id, old_status, new_status)
+            if action == "start":
+                self.warmed.discard(exam_id)
+
+    def run(self):
+        while True:
+            if time.monotonic() - self.last_sync >= SCHEDULER_RESYNC_SECONDS:
+                try:
+                    self.resync()
+                except Exception as e:
+                    print(f"Exam scheduler resync failed: {e}")
+                    self.last_sync = time.monotonic()
+
+            with self.cond:
+                now = datetime.now()
+                due = []
+                try:
+                    while self.heap and self.heap[0][0] <= now:
+                        due.append(heapq.heappop(self.heap))
+                    if not due:
+                        timeout = SCHEDULER_RESYNC_SECONDS - (time.monotonic() - self.last_sync)
+                        if self.heap:
+                            timeout = min(timeout, (self.heap[0][0] - now).total_seconds())
+                        self.cond.wait(timeout=max(timeout, 0))
+                        continue
+                except Exception as e:
+                    # An event whose time is not comparable; drop it rather than stop scheduling
+                    print(f"Exam scheduler dropped malformed events: {e}")
+                    self.heap = [event for event in self.heap if isinstance(event[0], datetime) and event[0].tzinfo is None]
+                    heapq.heapify(self.heap)
+                    continue
+
+            for _, action, exam_id in due:
+                try:
+                    self.fire(action, exam_id)
+                except Exception as e:
+                    print(f"Exam scheduler failed to {action} {exam_id}: {e}")
+
+exam_scheduler = ExamScheduler()
+
+@app.on_event("startup")
+def start_exam_scheduler():
+    threading.Thread(target=exam_scheduler.run, name="exam-scheduler", daemon=True).start()
 
 @app.post("/exams")
 def create_exam(exam_title: str, subject_id: str, start_time: datetime, end_time: datetime):
@@ -40,8 +382,7 @@ def create_exam(exam_title: str, subject_id: str, start_time: datetime, end_time
         raise HTTPException(status_code=404, detail="Subject not found")
 
     base_id = exam_title.lower().replace(" ", "")
-    existing = list(exams_collection.find({"_id": {"$regex": f"^{base_id}"}}))
-    exam_id = f"{base_id}-{len(existing)+1}"
+    exam_id = f"{base_id}-{reserve_ids(f'exams:{base_id}', exams_collection, f'{base_id}-')}"
 
     if exams_collection.find_one({"_id": exam_id}):
         raise HTTPException(status_code=400, detail="Exam ID already exists")
@@ -50,108 +391,343 @@ def create_exam(exam_title: str, subject_id: str, start_time: datetime, end_time
         "_id": exam_id,
         "title": exam_title,
         "subjectId": subject_id,
-        "startTime": start_time,
-        "endTime": end_time,
+        "startTime": as_datetime(start_time),
+        "endTime": as_datetime(end_time),
         "status": "scheduled"
     }
     exams_collection.insert_one(exam)
+    exam_scheduler.schedule(exam)
     return {"message": f"Exam '{exam_title}' created with ID '{exam_id}'!"}
 
 @app.put("/exams/{exam_id}/status")
 def change_exam_status(exam_id: str, status_update: ExamStatusUpdate):
-    if not exams_collection.find_one({"_id": exam_id}):
+    exam = exams_collection.find_one_and_update(
+        {"_id": exam_id},
+        {"$set": {"status": status_update.status}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
 
-    exams_collection.update_one({"_id": exam_id}, {"$set": {"status": status_update.status}})
+    exam_scheduler.schedule(exam)
+    publish_exam_transition(exam_id, None, status_update.status)
     return {"message": f"Exam status updated to {status_update.status}!"}
 
 @app.get("/exams")
-def get_all_exams():
-    exams = list(exams_collection.find())
-    return [
-        {
+def get_all_exams(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None
+):
+    if wants_ndjson(request):
+        subject_names = get_subject_names(exams_collection.distinct("subjectId"))
+        cursor = keyset_page(exams_collection, {}, limit, after)
+    else:
+        cursor = list(keyset_page(exams_collection, {}, limit, after))
+        subject_names = get_subject_names([e.get("subjectId") for e in cursor])
+
+    def format_exam(e):
+        return {
             "_id": e["_id"],
             "title": e.get("title"),
-            "subject_name": subjects_collection.find_one({"_id": e.get("subjectId")}).get("name"),
+            "subject_name": subject_names.get(e.get("subjectId")),
             "status": e.get("status"),
             "startTime": e.get("startTime"),
             "endTime": e.get("endTime")
         }
-        for e in exams
-    ]
+
+    return list_response(request, response, cursor, format_exam, limit)
 
 @app.delete("/admin/exams/{exam_id}")
 def delete_exam(exam_id: str):
     if not exams_collection.find_one({"_id": exam_id}):
         raise HTTPException(status_code=404, detail="Exam not found")
     exams_collection.delete_one({"_id": exam_id})
+    exam_stats_collection.delete_many({"_id.examId": exam_id})
+    publish_exam_transition(exam_id, None, "deleted")
     return {"message": "Exam deleted successfully!"}
 
-@app.get("/exams/by-student")
+def format_live_exam(e):
+    return {
+        "exam_id": e["_id"],
+        "title": e["title"],
+        "subjectId": e["subjectId"],
+        "startTime": e["startTime"],
+        "endTime": e["endTime"],
+        "durationMinutes": e["durationMinutes"]
+    }
+
 def get_exams_for_student(student_id: str):
     student_courses = get_student_courses(student_id)
+    # The exam scheduler keeps status in step with the exam window
     exams = exams_collection.find({
         "subjectId": {"$in": student_courses},
-        "status": "live",
-        "startTime": {"$lte": datetime.now()},
-        "endTime": {"$gte": datetime.now()}
+        "status": "live"
     })
-    return [
-        {
-            "exam_id": e["_id"],
-            "title": e["title"],
-            "subjectId": e["subjectId"],
-            "startTime": e["startTime"],
-            "endTime": e["endTime"],
-            "durationMinutes": e["durationMinutes"]
-        }
-        for e in exams
-    ]
+    return [format_live_exam(e) for e in exams]
+
+async def get_exams_for_student_async(student_id: str):
+    student_courses = await get_student_courses_async(student_id)
+    exams = motor_db.exams.find({
+        "subjectId": {"$in": student_courses},
+        "status": "live"
+    })
+    return [format_live_exam(e) async for e in exams]
+
+app.add_api_route(
+    "/exams/by-student",
+    get_exams_for_student_async if USE_MOTOR else get_exams_for_student,
+    methods=["GET"]
+)
+
+def format_result(r):
+    return {
+        "id": str(r["_id"]),
+        "examId": r["examId"],
+        "marksObtained": r["marksObtained"],
+        "totalMarks": r["totalMarks"],
+        "percentage": r["percentage"],
+        "grade": r["grade"],
+        "computedAt": r["computedAt"]
+    }
 
 @app.get("/results")
-def get_results_for_student(student_id: str, subject_id: Optional[str] = None):
+def get_results_for_student(
+    student_id: str,
+    request: Request,
+    response: Response,
+    subject_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None
+):
     query = {"studentId": student_id}
     if subject_id:
         exam_ids = [e["_id"] for e in exams_collection.find({"subjectId": subject_id}, {"_id": 1})]
         query["examId"] = {"$in": exam_ids}
-    results = results_collection.find(query)
-    return [
-        {
-            "examId": r["examId"],
-            "marksObtained": r["marksObtained"],
-            "totalMarks": r["totalMarks"],
-            "percentage": r["percentage"],
-            "grade": r["grade"],
-            "computedAt": r["computedAt"]
+    if after is not None and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+    results = keyset_page(results_collection, query, limit, ObjectId(after) if after else None)
+    return list_response(request, response, results, format_result, limit)
+
+@app.get("/results/by-class")
+def get_results_for_class(class_id: str, subject_id: str):
+    exam_ids = exams_collection.distinct("_id", {"subjectId": subject_id})
+    students = students_collection.aggregate([
+        {"$match": {"classId": class_id}},
+        {"$sort": {"_id": 1}},
+        {"$lookup": {
+            "from": "results",
+            "localField": "_id",
+            "foreignField": "studentId",
+            "pipeline": [
+                {"$match": {"examId": {"$in": exam_ids}}},
+                {"$sort": {"_id": 1}},
+                {"$project": {
+                    "_id": 0,
+                    "id": {"$toString": "$_id"},
+                    "examId": 1,
+                    "marksObtained": 1,
+                    "totalMarks": 1,
+                    "percentage": 1,
+                    "grade": 1,
+                    "computedAt": 1
+                }}
+            ],
+            "as": "results"
+        }},
+        {"$project": {"_id": 0, "id": "$_id", "name": 1, "rollNumber": 1, "results": 1}}
+    ])
+    return list(students)
+
+@app.get("/results/live")
+def get_live_score(student_id: str, exam_id: str):
+    totals = running_totals_collection.find_one({"studentId": student_id, "examId": exam_id})
+    if not totals:
+        raise HTTPException(status_code=404, detail="No answers recorded for this exam")
+    return {
+        "examId": exam_id,
+        "marksObtained": totals.get("marksObtained", 0),
+        "totalMarks": totals.get("totalMarks", 0),
+        "answered": totals.get("answered", 0),
+        "updatedAt": totals.get("updatedAt")
+    }
+
+def compute_exam_stats(exam_id: str):
+    percentages = []
+    grades = []
+    for r in results_collection.find({"examId": exam_id}, {"_id": 0, "percentage": 1, "grade": 1}):
+        percentages.append(r.get("percentage", 0))
+        grades.append(r.get("grade"))
+
+    if not percentages:
+        return {"count": 0, "mean": None, "median": None, "std": None, "percentiles": {}, "histogram": [], "grades": {}}
+
+    scores = np.asarray(percentages, dtype=float)
+    p10, p25, p75, p90 = np.percentile(scores, [10, 25, 75, 90])
+    counts, edges = np.histogram(scores, bins=10, range=(0, 100))
+    grade_labels, grade_counts = np.unique(np.asarray(grades, dtype=str), return_counts=True)
+
+    return {
+        "count": int(scores.size),
+        "mean": float(scores.mean()),
+        "median": float(np.median(scores)),
+        "std": float(scores.std()),
+        "percentiles": {"p10": float(p10), "p25": float(p25), "p75": float(p75), "p90": float(p90)},
+        "histogram": [
+            {"from": float(edges[i]), "to": float(edges[i + 1]), "count": int(counts[i])}
+            for i in range(len(counts))
+        ],
+        "grades": {str(g): int(c) for g, c in zip(grade_labels, grade_counts)}
+    }
+
+@app.get("/exams/{exam_id}/stats")
+def get_exam_stats(exam_id: str):
+    exam = exams_collection.find_one({"_id": exam_id}, {"status": 1, "finalizedAt": 1})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    # Ended exams are served from a snapshot of the finalize run that produced their
+    # results; a re-finalize gets a new finalizedAt and so a new snapshot
+    snapshot_id = None
+    if exam.get("status") == "ended" and exam.get("finalizedAt"):
+        snapshot_id = {"examId": exam_id, "finalizedAt": exam["finalizedAt"]}
+        snapshot = exam_stats_collection.find_one({"_id": snapshot_id})
+        if snapshot:
+            return snapshot["stats"]
+
+    stats = {"examId": exam_id, **compute_exam_stats(exam_id)}
+    if snapshot_id:
+        exam_stats_collection.replace_one({"_id": snapshot_id}, {"stats": stats}, upsert=True)
+    return stats
+
+def export_rows(exam_id: str, questions: list):
+    # Students and per-question marks are joined one chunk of results at a time
+    results = results_collection.find({"examId": exam_id}).sort("studentId", 1)
+    while True:
+        chunk = list(itertools.islice(results, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        student_ids = [r["studentId"] for r in chunk]
+        students = {
+            s["_id"]: s
+            for s in students_collection.find({"_id": {"$in": student_ids}}, {"name": 1, "rollNumber": 1})
         }
-        for r in results
-    ]
+        marks = defaultdict(dict)
+        for resp in responses_collection.find(
+            {"examId": exam_id, "studentId": {"$in": student_ids}},
+            {"studentId": 1, "id": 1, "marksAwarded": 1}
+        ):
+            marks[resp["studentId"]][resp["id"]] = resp.get("marksAwarded")
+
+        rows = []
+        for r in chunk:
+            student = students.get(r["studentId"], {})
+            row = {
+                "studentId": r["studentId"],
+                "studentName": student.get("name"),
+                "rollNumber": student.get("rollNumber")
+            }
+            for i, q in enumerate(questions, 1):
+                row[f"Q{i}"] = marks[r["studentId"]].get(q["_id"])
+            row.update({
+                "marksObtained": r.get("marksObtained"),
+                "totalMarks": r.get("totalMarks"),
+                "percentage": r.get("percentage"),
+                "grade": r.get("grade")
+            })
+            rows.append(row)
+        yield rows
+
+def export_csv(exam_id: str, questions: list):
+    buffer = io.StringIO()
+    writer = None
+    for rows in export_rows(exam_id, questions):
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+def export_parquet(exam_id: str, questions: list, path: str):
+    schema = pa.schema(
+        [("studentId", pa.string()), ("studentName", pa.string()), ("rollNumber", pa.string())]
+        + [(f"Q{i}", pa.float64()) for i in range(1, len(questions) + 1)]
+        + [("marksObtained", pa.float64()), ("totalMarks", pa.float64()),
+           ("percentage", pa.float64()), ("grade", pa.string())]
+    )
+    # One row group per chunk keeps memory bounded by EXPORT_CHUNK_SIZE
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in export_rows(exam_id, questions):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+@app.get("/exams/{exam_id}/results/export")
+def export_exam_results(exam_id: str, format: Literal["csv", "parquet"] = "csv"):
+    if not exams_collection.find_one({"_id": exam_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Exam not found")
+    questions = list(questions_collection.find({"examId": exam_id}, {"_id": 1}).sort("_id", 1))
+
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(exam_id, questions),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{exam_id}-results.csv"'}
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        export_parquet(exam_id, questions, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{exam_id}-results.parquet",
+        background=BackgroundTask(os.remove, path)
+    )
 
 @app.get("/all-results")
 def get_all_results(subject_id: Optional[str] = None):
-    final = []
-    for s in students_collection.find():
-        student_id = s["_id"]
-        results = []
-        for r in responses_collection.find({"studentId": student_id}):
-            q = questions_collection.find_one({"_id": r["id"]})
-            e = exams_collection.find_one({"_id": r["examId"]})
-            if subject_id and e["subjectId"] != subject_id:
-                continue
-            results.append({
-                "examTitle": e["title"],
-                "questionText": q["questionText"],
-                "longAnswerText": r.get("longAnswerText", r.get("longAnswerText", "")),
-                "marksObtained": r.get("marksAwarded", 0),
-                "type": r["type"]
-            })
-        if results:
-            final.append({
-                "studentId": student_id,
-                "studentName": s["name"],
-                "results": results
-            })
-    return final
+    pipeline = []
+
+    # Push the subject filter down to the responses before any join
+    if subject_id:
+        exam_ids = exams_collection.distinct("_id", {"subjectId": subject_id})
+        pipeline.append({"$match": {"examId": {"$in": exam_ids}}})
+
+    pipeline += [
+        {"$lookup": {"from": "questions", "localField": "id", "foreignField": "_id", "as": "question"}},
+        {"$unwind": "$question"},
+        {"$lookup": {"from": "exams", "localField": "examId", "foreignField": "_id", "as": "exam"}},
+        {"$unwind": "$exam"},
+        {"$group": {
+            "_id": "$studentId",
+            "results": {"$push": {
+                "examTitle": "$exam.title",
+                "questionText": "$question.questionText",
+                "longAnswerText": {"$ifNull": ["$longAnswerText", ""]},
+                "marksObtained": {"$ifNull": ["$marksAwarded", 0]},
+                "type": "$type"
+            }}
+        }},
+        {"$lookup": {"from": "students", "localField": "_id", "foreignField": "_id", "as": "student"}},
+        {"$unwind": "$student"},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0,
+            "studentId": "$_id",
+            "studentName": "$student.name",
+            "results": 1
+        }}
+    ]
+
+    cursor = responses_collection.aggregate(pipeline, allowDiskUse=True)
+    return StreamingResponse(ndjson_stream(cursor), media_type="application/x-ndjson")
 
 
 @app.delete("/exams/{exam_id}")
@@ -164,6 +740,8 @@ def delete_exam(exam_id: str = Path(..., description="ID of the exam to delete")
 
     if result_exam.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Exam not found")
+    exam_stats_collection.delete_many({"_id.examId": exam_id})
+    publish_exam_transition(exam_id, None, "deleted")
 
     return {
         "message": "Exam and associated questions deleted.",
@@ -182,14 +760,18 @@ async def publish_exam(exam_id: str, request: Request):
 
     new_status = "scheduled" if is_published else "draft"
 
-    result = exams_collection.update_one(
+    exam = exams_collection.find_one_and_update(
         {"_id": exam_id},
-        {"$set": {"isPublished": is_published, "status": new_status}}
+        {"$set": {"isPublished": is_published, "status": new_status}},
+        return_document=ReturnDocument.AFTER
     )
 
-    if result.matched_count == 0:
+    if exam is None:
         raise HTTPException(status_code=404, detail="Exam not found")
 
+    exam_scheduler.schedule(exam)
+    publish_exam_transition(exam_id, None, new_status)
+
     return {"message": f"Exam {'published' if is_published else 'unpublished'} successfully"}
 
 @app.post("/exams/create")
@@ -197,8 +779,8 @@ def create_exam(data: dict):
     # Extract exam details
     title = data.get("title")
     subject_id = data.get("subjectId")
-    start_time = data.get("startTime")
-    end_time = data.get("endTime")
+    start_time = as_datetime(data.get("startTime"))
+    end_time = as_datetime(data.get("endTime"))
     duration_minutes = data.get("durationMinutes")
     created_by = data.get("createdBy")
     is_published = data.get("isPublished", False)
@@ -226,6 +808,7 @@ def create_exam(data: dict):
     }
 
     exams_collection.insert_one(exam)
+    exam_scheduler.schedule(exam)
 
     return {"message": "Exam created successfully!", "examId": exam_id}
 
@@ -245,10 +828,17 @@ def update_exam_status(request: Request):
         raise HTTPException(status_code=404, detail="Exam not found")
 
 @app.get("/exams/by-subject")
-def get_exams_by_subject(subject_id: str):
-    exams = exams_collection.find({"subjectId": subject_id})
-    return [
-        {
+def get_exams_by_subject(
+    subject_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None
+):
+    exams = keyset_page(exams_collection, {"subjectId": subject_id}, limit, after)
+
+    def format_exam(exam):
+        return {
             "id": str(exam["_id"]),
             "title": exam["title"],
             "subjectId": str(exam["subjectId"]),
@@ -259,70 +849,212 @@ def get_exams_by_subject(subject_id: str):
             "status": exam["status"],
             "isPublished": exam["isPublished"]
         }
-        for exam in exams
-    ]
+
+    return list_response(request, response, exams, format_exam, limit)
 
 from fastapi import FastAPI, HTTPException, Query
 from datetime import datetime
 
-@app.post("/exams/finalize-results")
-def finalize_exam_results(exam_id: str = Query(...)):
-    student_ids = db.responses.distinct("studentId", {"examId": exam_id})
-    questions = list(db.questions.find({"examId": exam_id}))
-    question_map = {str(q["_id"]): q for q in questions}
+# Grade boundaries carry a version that update_grade_boundaries bumps. Readers
+# use the cached copy and only compare versions every few seconds.
+grade_config_cache = {"version": None, "config": None, "checkedAt": 0.0}
 
-    # 🔍 Fetch grade boundaries from config
-    config = db.config.find_one({"_id": "grade_boundaries"})
-    if not config:
-        raise HTTPException(status_code=500, detail="Grade boundaries not configured")
+def get_grade_config():
+    now = time.monotonic()
+    if grade_config_cache["config"] and now - grade_config_cache["checkedAt"] < GRADE_CONFIG_RECHECK_SECONDS:
+        return grade_config_cache["config"]
 
-    for student_id in student_ids:
-        responses = list(db.responses.find({"examId": exam_id, "studentId": student_id}))
+    marker = db.config.find_one({"_id": "grade_boundaries"}, {"version": 1})
+    if not marker:
+        grade_config_cache.update(version=None, config=None, checkedAt=0.0)
+        return None
+    if marker.get("version", 0) != grade_config_cache["version"] or not grade_config_cache["config"]:
+        config = db.config.find_one({"_id": "grade_boundaries"})
+        grade_config_cache.update(version=config.get("version", 0), config=config)
+    grade_config_cache["checkedAt"] = now
+    return grade_config_cache["config"]
 
-        total = 0
-        max_marks = 0
+def grade_for(percentage, config):
+    if percentage >= config.get("A", 80):
+        return "A"
+    elif percentage >= config.get("B", 60):
+        return "B"
+    elif percentage >= config.get("C", 40):
+        return "C"
+    return "F"
 
-        for r in responses:
-            q = question_map.get(str(r["id"]))
-            if not q:
-                continue
-            total += r.get("marksAwarded", 0)
-            max_marks += q.get("marks", 0)
+def running_totals_complete(exam_id: str):
+    # Running totals only cover an exam if they count every stored response; exams
+    # that were already taking answers when totals were introduced fall short
+    counted = next(running_totals_collection.aggregate([
+        {"$match": {"examId": exam_id}},
+        {"$group": {"_id": None, "answered": {"$sum": "$answered"}}}
+    ]), None)
+    if counted is None:
+        return False
+    stored = responses_collection.count_documents({"examId": exam_id})
+    if counted["answered"] != stored:
+        print(f"Running totals for {exam_id} cover {counted['answered']} of {stored} responses; recomputing from responses")
+        return False
+    return True
 
-        if max_marks == 0:
-            continue
+def exam_totals(exam_id: str):
+    # Response-service keeps running totals as answers are submitted and graded
+    if running_totals_complete(exam_id):
+        yield from running_totals_collection.find(
+            {"examId": exam_id},
+            {"_id": 0, "studentId": 1, "marksObtained": 1, "totalMarks": 1}
+        )
+        return
 
-        percentage = (total / max_marks) * 100
+    # Exams whose running totals are missing or incomplete: one pass over the responses
+    questions = list(db.questions.find({"examId": exam_id}, {"marks": 1}))
+    question_map = {str(q["_id"]): q for q in questions}
+    totals = db.responses.aggregate([
+        {"$match": {"examId": exam_id, "id": {"$in": [q["_id"] for q in questions]}}},
+        {"$group": {
+            "_id": "$studentId",
+            "total": {"$sum": "$marksAwarded"},
+            "questionIds": {"$push": "$id"}
+        }}
+    ], allowDiskUse=True)
+    for t in totals:
+        yield {
+            "studentId": t["_id"],
+            "marksObtained": t["total"],
+            "totalMarks": sum(question_map[str(qid)].get("marks", 0) for qid in t["questionIds"])
+        }
 
-        # 🎯 Grade logic using dynamic config
-        if percentage >= config.get("A", 80):
-            grade = "A"
-        elif percentage >= config.get("B", 60):
-            grade = "B"
-        elif percentage >= config.get("C", 40):
-            grade = "C"
-        else:
-            grade = "F"
+def finalize_exam(exam_id: str, config: dict, batch_size: Optional[int] = None, on_progress=None):
+    started = time.perf_counter()
+    computed_at = datetime.utcnow()
+    students_processed = 0
+    results_written = 0
+    writes = []
+    for t in exam_totals(exam_id):
+        students_processed += 1
+        max_marks = t.get("totalMarks", 0)
+        if max_marks == 0:
+            continue
 
-        db.results.update_one(
-            {"studentId": student_id, "examId": exam_id},
+        percentage = (t["marksObtained"] / max_marks) * 100
+        writes.append(UpdateOne(
+            {"studentId": t["studentId"], "examId": exam_id},
             {"$set": {
-                "marksObtained": total,
+                "marksObtained": t["marksObtained"],
                 "totalMarks": max_marks,
                 "percentage": percentage,
-                "grade": grade,
-                "computedAt": datetime.utcnow()
+                "grade": grade_for(percentage, config),
+                "computedAt": computed_at
             }},
             upsert=True
-        )
+        ))
+
+        if batch_size and len(writes) >= batch_size:
+            db.results.bulk_write(writes, ordered=False)
+            results_written += len(writes)
+            writes = []
+            if on_progress:
+                on_progress(students_processed)
+
+    if writes:
+        db.results.bulk_write(writes, ordered=False)
+        results_written += len(writes)
+    if on_progress:
+        on_progress(students_processed)
 
     # ✅ Mark exam as ended
     db.exams.update_one(
         {"_id": exam_id},
-        {"$set": {"status": "ended"}}
+        {"$set": {"status": "ended", "finalizedAt": computed_at}}
+    )
+    # Stats snapshots of earlier finalize runs are never served again
+    exam_stats_collection.delete_many({"_id.examId": exam_id})
+    publish_exam_transition(exam_id, None, "ended")
+
+    return {
+        "studentsProcessed": students_processed,
+        "resultsWritten": results_written,
+        "elapsedSeconds": round(time.perf_counter() - started, 3)
+    }
+
+def run_finalize_job(job_id: str, exam_id: str, config: dict):
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "running", "startedAt": datetime.utcnow()}}
     )
 
-    return {"message": "Results finalized and stored successfully!"}
+    def on_progress(processed):
+        jobs_collection.update_one({"_id": job_id}, {"$set": {"processed": processed}})
+
+    try:
+        summary = finalize_exam(exam_id, config, batch_size=FINALIZE_BATCH_SIZE, on_progress=on_progress)
+    except Exception as e:
+        jobs_collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finishedAt": datetime.utcnow()}}
+        )
+        return
+
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": "completed", "summary": summary, "finishedAt": datetime.utcnow()}}
+    )
+
+@app.post("/exams/finalize-results")
+def finalize_exam_results(exam_id: str = Query(...), background: bool = Query(False)):
+    # 🔍 Fetch grade boundaries from config
+    config = get_grade_config()
+    if not config:
+        raise HTTPException(status_code=500, detail="Grade boundaries not configured")
+
+    if not background:
+        summary = finalize_exam(exam_id, config)
+        return {"message": "Results finalized and stored successfully!", **summary}
+
+    job_id = uuid.uuid4().hex
+    jobs_collection.insert_one({
+        "_id": job_id,
+        "type": "finalize-results",
+        "examId": exam_id,
+        "status": "queued",
+        "processed": 0,
+        "total": (
+            running_totals_collection.count_documents({"examId": exam_id})
+            or len(db.responses.distinct("studentId", {"examId": exam_id}))
+        ),
+        "createdAt": datetime.utcnow()
+    })
+    finalize_pool.submit(run_finalize_job, job_id, exam_id, config)
+    return {"message": "Result finalization started.", "jobId": job_id}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs_collection.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    eta_seconds = None
+    if job["status"] == "running" and job.get("processed") and job.get("startedAt"):
+        elapsed = (datetime.utcnow() - job["startedAt"]).total_seconds()
+        remaining = max(job["total"] - job["processed"], 0)
+        eta_seconds = round(elapsed / job["processed"] * remaining, 1)
+    elif job["status"] == "completed":
+        eta_seconds = 0
+
+    return {
+        "jobId": job["_id"],
+        "type": job["type"],
+        "examId": job["examId"],
+        "status": job["status"],
+        "processed": job.get("processed", 0),
+        "total": job.get("total", 0),
+        "etaSeconds": eta_seconds,
+        "summary": job.get("summary"),
+        "error": job.get("error"),
+        "createdAt": job.get("createdAt"),
+        "finishedAt": job.get("finishedAt")
+    }
 
 from pydantic import BaseModel
 from fastapi import Body
@@ -336,14 +1068,16 @@ class GradeBoundaries(BaseModel):
 def update_grade_boundaries(boundaries: GradeBoundaries = Body(...)):
     result = db.config.update_one(
         {"_id": "grade_boundaries"},
-        {"$set": boundaries.dict()},
+        {"$set": boundaries.dict(), "$inc": {"version": 1}},
         upsert=True
     )
+    # Make the next read in this process pick up the new version straight away
+    grade_config_cache["checkedAt"] = 0.0
     return {"message": "Grade boundaries updated."}
 
 @app.get("/config/grade-boundaries")
 def get_grade_boundaries():
-    config = db.config.find_one({"_id": "grade_boundaries"})
+    config = get_grade_config()
     if not config:
         raise HTTPException(status_code=404, detail="Grade boundaries not found")
     
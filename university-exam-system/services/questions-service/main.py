@@ -3,9 +3,16 @@ from pydantic import BaseModel
 from typing import List, Optional, Literal
 from pymongo import MongoClient
 from bson import ObjectId
+from datetime import datetime
 import os
 import uvicorn
 
+try:
+    from index_bootstrap import apply_index_manifest  # Mounted by docker-compose with data/indexes.json
+except ImportError:
+    apply_index_manifest = None
+
+
 # MongoDB Setup
 mongo_url = os.getenv("MONGO_URL", "mongodb://mongodb:27017")
 client = MongoClient(mongo_url)
@@ -18,15 +25,30 @@ questions_collection = db.questions
 classes_collection = db.classes
 responses_collection = db.responses
 results_collection = db.results
+exam_events_collection = db.exam_events
 
 app = FastAPI()
 
+# Collections whose manifest indexes this service maintains (see data/index_bootstrap.py)
+INDEX_COLLECTIONS = ("questions",)
+
+@app.on_event("startup")
+def ensure_indexes():
+    if apply_index_manifest is None:
+        print("index_bootstrap.py is not mounted; skipping index bootstrap")
+        return
+    apply_index_manifest(db, INDEX_COLLECTIONS)
+
 def str_to_objectid(id: str):
     try:
         return ObjectId(id)
     except Exception:
         return None
     
+def publish_questions_changed(exam_id):
+    # response-service caches each exam's answer key and follows exam_events to drop it
+    exam_events_collection.insert_one({"examId": exam_id, "type": "questions", "at": datetime.utcnow()})
+
 class QuestionCreate(BaseModel):
     questionText: str
     type: Literal["mcq", "long"]
@@ -56,6 +78,7 @@ def add_question(exam_id: str, question: QuestionCreate):
             raise HTTPException(status_code=400, detail="Long questions must have expectedKeywords")
 
     questions_collection.insert_one(question_data)
+    publish_questions_changed(exam_obj_id)
     return {"message": "Question added successfully!"}
 
 @app.post("/questions/create")
@@ -91,13 +114,15 @@ def create_question(data: dict):
         raise HTTPException(status_code=400, detail="Unsupported question type.")
 
     questions_collection.insert_one(question)
+    publish_questions_changed(exam_id)
     return {"message": "Question added successfully!"}
 
 @app.delete("/questions/{question_id}")
 def delete_question(question_id: str):
-    result = questions_collection.delete_one({"_id": str_to_objectid(question_id)})
-    if result.deleted_count == 0:
+    question = questions_collection.find_one_and_delete({"_id": str_to_objectid(question_id)}, {"examId": 1})
+    if question is None:
         raise HTTPException(status_code=404, detail="Question not found")
+    publish_questions_changed(question.get("examId"))
     return {"message": "Question deleted successfully"}
     
 @app.get("/question/get")
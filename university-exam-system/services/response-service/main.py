@@ -1,12 +1,29 @@
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, PyMongoError
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import asyncio
 import os
+import pymongo
+import queue
+import threading
+import time
 import uvicorn
 
+try:
+    from index_bootstrap import apply_index_manifest  # Mounted by docker-compose with data/indexes.json
+except ImportError:
+    apply_index_manifest = None
+
+
+from scoring import score_chunk, suggest
+from spool import Spool
+
 
 # MongoDB Setup
 mongo_url = os.getenv("MONGO_URL", "mongodb://mongodb:27017")
@@ -20,14 +37,169 @@ questions_collection = db.questions
 classes_collection = db.classes
 responses_collection = db.responses
 results_collection = db.results
+running_totals_collection = db.running_totals
+exam_events_collection = db.exam_events
+
+EXAM_CACHE_SIZE = int(os.getenv("EXAM_CACHE_SIZE", "256"))
+EXAM_CACHE_TTL = float(os.getenv("EXAM_CACHE_TTL", "300"))
+EXAM_EVENTS_POLL_SECONDS = float(os.getenv("EXAM_EVENTS_POLL_SECONDS", "1"))
+# Events are re-read this far behind the newest one seen, so an event stamped
+# earlier but committed later (or by a host with a lagging clock) is not skipped
+EXAM_EVENTS_OVERLAP_SECONDS = float(os.getenv("EXAM_EVENTS_OVERLAP_SECONDS", "30"))
+
+# Opt-in group commit: single-answer submissions are queued and written together,
+# flushing after GROUP_COMMIT_INTERVAL_MS or once GROUP_COMMIT_MAX_DOCS are waiting
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MAX_DOCS = int(os.getenv("GROUP_COMMIT_MAX_DOCS", "200"))
+GROUP_COMMIT_INTERVAL_MS = float(os.getenv("GROUP_COMMIT_INTERVAL_MS", "20"))
+
+# Local spool (see spool.py) for answers Mongo cannot take; empty SPOOL_DIR disables it
+SPOOL_DIR = os.getenv("SPOOL_DIR", "")
+SPOOL_LATENCY_MS = float(os.getenv("SPOOL_LATENCY_MS", "500"))
+SPOOL_WRITE_TIMEOUT_SECONDS = float(os.getenv("SPOOL_WRITE_TIMEOUT_SECONDS", "2"))
+SPOOL_DRAIN_SECONDS = float(os.getenv("SPOOL_DRAIN_SECONDS", "5"))
+SPOOL_DRAIN_BATCH = int(os.getenv("SPOOL_DRAIN_BATCH", "500"))
+
+# Keyword auto-scoring (see scoring.py): exam-wide runs are split into chunks per question
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "200"))
+
+# Opt-in async data layer for the submission hot path (see benchmarks/bench_async.py)
+USE_MOTOR = os.getenv("USE_MOTOR", "0") == "1"
+if USE_MOTOR:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    motor_db = AsyncIOMotorClient(mongo_url).university
 
 app = FastAPI()
 
+# Collections whose manifest indexes this service maintains (see data/index_bootstrap.py)
+INDEX_COLLECTIONS = ("responses", "running_totals")
+
+@app.on_event("startup")
+def ensure_indexes():
+    if apply_index_manifest is None:
+        print("index_bootstrap.py is not mounted; skipping index bootstrap")
+        return
+    apply_index_manifest(db, INDEX_COLLECTIONS)
+
 class AnswerSubmit(BaseModel):
     longAnswerText: str
     marksObtained: Optional[int] = None
     type: str  # 'mcq' or 'long'
 
+class BatchAnswer(BaseModel):
+    questionId: str
+    type: str  # 'mcq' or 'long'
+    selectedAnswerIndex: Optional[int] = None
+    longAnswerText: Optional[str] = None
+
+class BatchSubmit(BaseModel):
+    studentId: str
+    answers: List[BatchAnswer]
+
+class GradeItem(BaseModel):
+    response_id: str
+    marks: int
+
+class BulkGrade(BaseModel):
+    gradedBy: str
+    grades: List[GradeItem]
+
+class TTLCache:
+    # Small thread-safe LRU whose entries also expire after `ttl` seconds
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+# Live window and answer key per exam, so a submission needs no reads
+exam_cache = TTLCache(EXAM_CACHE_SIZE, EXAM_CACHE_TTL)
+
+def exam_meta(exam, questions):
+    return {
+        "exam": exam,
+        "questions": {q["_id"]: q for q in questions}
+    }
+
+def get_exam_meta(exam_id: str):
+    meta = exam_cache.get(exam_id)
+    if meta is None:
+        exam = exams_collection.find_one({"_id": exam_id}, {"status": 1, "startTime": 1, "endTime": 1})
+        if not exam:
+            return None
+        questions = questions_collection.find(
+            {"examId": exam_id},
+            {"type": 1, "marks": 1, "correctAnswerIndex": 1}
+        )
+        meta = exam_meta(exam, questions)
+        exam_cache.set(exam_id, meta)
+    return meta
+
+async def get_exam_meta_async(exam_id: str):
+    meta = exam_cache.get(exam_id)
+    if meta is None:
+        exam = await motor_db.exams.find_one({"_id": exam_id}, {"status": 1, "startTime": 1, "endTime": 1})
+        if not exam:
+            return None
+        questions = motor_db.questions.find(
+            {"examId": exam_id},
+            {"type": 1, "marks": 1, "correctAnswerIndex": 1}
+        )
+        meta = exam_meta(exam, [q async for q in questions])
+        exam_cache.set(exam_id, meta)
+    return meta
+
+def follow_exam_events():
+    # exam-service and questions-service publish to exam_events whenever an exam's
+    # status or questions change; drop the cached metadata for that exam.
+    # Publishers stamp `at` themselves, so neither it nor _id arrives in order;
+    # each poll re-reads an overlap window and skips the events already handled.
+    overlap = timedelta(seconds=EXAM_EVENTS_OVERLAP_SECONDS)
+    latest = datetime.utcnow()
+    seen = {}  # _id -> at, for events inside the window
+    while True:
+        try:
+            since = latest - overlap
+            for event in exam_events_collection.find({"at": {"$gte": since}}, {"examId": 1, "at": 1}).sort("at", 1):
+                latest = max(latest, event["at"])
+                if event["_id"] in seen:
+                    continue
+                seen[event["_id"]] = event["at"]
+                exam_cache.pop(event["examId"])
+            since = latest - overlap
+            seen = {event_id: at for event_id, at in seen.items() if at >= since}
+        except Exception as e:
+            print(f"Failed to read exam events: {e}")
+        time.sleep(EXAM_EVENTS_POLL_SECONDS)
+
+@app.on_event("startup")
+def start_exam_event_follower():
+    threading.Thread(target=follow_exam_events, name="exam-events", daemon=True).start()
+
 def str_to_objectid(id: str):
     try:
         return ObjectId(id)
@@ -37,16 +209,23 @@ def str_to_objectid(id: str):
 def is_exam_live(exam):
     return exam["status"] == "live" and exam["startTime"] <= datetime.now() <= exam["endTime"]
 
-@app.post("/exams/{exam_id}/questions/{question_id}/response")
-def submit_answer(exam_id: str, question_id: str, student_id: str, answer: AnswerSubmit):
-    exam = exams_collection.find_one({"_id": exam_id})
-    if not exam or not is_exam_live(exam):
-        raise HTTPException(status_code=404, detail="Exam not found or not live")
+def running_total_update(student_id: str, exam_id: str, marks: int = 0, total_marks: int = 0, answered: int = 0):
+    # Per-(student, exam) totals that exam-service turns into results at finalize time
+    return (
+        {"studentId": student_id, "examId": exam_id},
+        {
+            "$inc": {"marksObtained": marks, "totalMarks": total_marks, "answered": answered},
+            "$set": {"updatedAt": datetime.utcnow()}
+        }
+    )
 
-    question = questions_collection.find_one({"_id": ObjectId(question_id), "examId": exam_id})
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
+def add_to_running_total(student_id: str, exam_id: str, marks: int = 0, total_marks: int = 0, answered: int = 0):
+    running_totals_collection.update_one(
+        *running_total_update(student_id, exam_id, marks, total_marks, answered),
+        upsert=True
+    )
 
+def build_response(exam_id: str, question_id: str, student_id: str, answer: AnswerSubmit, question: dict):
     response_data = {
         "examId": exam_id,
         "id": ObjectId(question_id),
@@ -69,17 +248,335 @@ def submit_answer(exam_id: str, question_id: str, student_id: str, answer: Answe
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid selectedAnswerIndex for MCQ")
 
-    responses_collection.insert_one(response_data)
+    return response_data
+
+def response_upsert(response_data: dict):
+    # One response per (exam, student, question): a retried submission matches the
+    # existing document and leaves it untouched
+    key = {k: response_data[k] for k in ("examId", "studentId", "id")}
+    fields = {k: v for k, v in response_data.items() if k not in key}
+    return key, {"$setOnInsert": fields}
+
+def write_responses(documents: list, question_marks: list):
+    # Upserts responses in one round trip and adds the new ones to running totals.
+    # Returns the indexes of the documents that were inserted; the rest were already stored.
+    writes = [UpdateOne(*response_upsert(d), upsert=True) for d in documents]
+    try:
+        inserted = set(responses_collection.bulk_write(writes, ordered=False).upserted_ids)
+    except BulkWriteError as e:
+        # Duplicate keys only mean a concurrent retry already stored that answer
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        inserted = {u["index"] for u in e.details.get("upserted", [])}
+
+    totals = defaultdict(lambda: {"marks": 0, "total_marks": 0, "answered": 0})
+    for i in inserted:
+        total = totals[(documents[i]["studentId"], documents[i]["examId"])]
+        total["marks"] += documents[i].get("marksAwarded") or 0
+        total["total_marks"] += question_marks[i]
+        total["answered"] += 1
+    if totals:
+        running_totals_collection.bulk_write([
+            UpdateOne(*running_total_update(student_id, exam_id, **total), upsert=True)
+            for (student_id, exam_id), total in totals.items()
+        ], ordered=False)
+    return inserted
+
+spool = Spool(SPOOL_DIR) if SPOOL_DIR else None
+# Set while Mongo is failing or slow; submissions then go straight to the spool
+# until the drainer has replayed it and Mongo answers quickly again
+mongo_degraded = threading.Event()
+
+def is_mongo_outage(e: PyMongoError):
+    return isinstance(e, ConnectionFailure) or e.timeout
+
+def store_responses(documents: list, question_marks: list):
+    # write_responses with the spool as fallback; returns None when the answers were spooled
+    if spool is None:
+        return write_responses(documents, question_marks)
+    if mongo_degraded.is_set():
+        spool.append(documents, question_marks)
+        return None
+    started = time.monotonic()
+    try:
+        with pymongo.timeout(SPOOL_WRITE_TIMEOUT_SECONDS):
+            inserted = write_responses(documents, question_marks)
+    except PyMongoError as e:
+        if not is_mongo_outage(e):
+            raise
+        print(f"Spooling {len(documents)} responses: {e}")
+        mongo_degraded.set()
+        spool.append(documents, question_marks)
+        return None
+    if (time.monotonic() - started) * 1000 > SPOOL_LATENCY_MS:
+        mongo_degraded.set()
+    return inserted
+
+async def spool_responses_async(documents: list, question_marks: list):
+    await asyncio.get_running_loop().run_in_executor(None, spool.append, documents, question_marks)
+
+async def write_response_async(response_data: dict, question_marks: int):
+    try:
+        result = await motor_db.responses.update_one(*response_upsert(response_data), upsert=True)
+    except DuplicateKeyError:
+        return  # A concurrent retry of the same answer got there first
+    if result.upserted_id is not None:
+        await motor_db.running_totals.update_one(
+            *running_total_update(
+                response_data["studentId"],
+                response_data["examId"],
+                marks=response_data.get("marksAwarded") or 0,
+                total_marks=question_marks,
+                answered=1
+            ),
+            upsert=True
+        )
+
+async def store_response_async(response_data: dict, question_marks: int):
+    # The Motor counterpart of store_responses, with the same spooling policy
+    if spool is None:
+        await write_response_async(response_data, question_marks)
+        return
+    if mongo_degraded.is_set():
+        await spool_responses_async([response_data], [question_marks])
+        return
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(write_response_async(response_data, question_marks), SPOOL_WRITE_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, PyMongoError) as e:
+        if isinstance(e, PyMongoError) and not is_mongo_outage(e):
+            raise
+        print(f"Spooling 1 response: {e!r}")
+        mongo_degraded.set()
+        await spool_responses_async([response_data], [question_marks])
+        return
+    if (time.monotonic() - started) * 1000 > SPOOL_LATENCY_MS:
+        mongo_degraded.set()
+
+def drain_spool():
+    while True:
+        time.sleep(SPOOL_DRAIN_SECONDS)
+        if not mongo_degraded.is_set() and not spool.segments():
+            continue
+        try:
+            replayed = spool.drain(write_responses, SPOOL_DRAIN_BATCH)
+            started = time.monotonic()
+            client.admin.command("ping")
+            if (time.monotonic() - started) * 1000 <= SPOOL_LATENCY_MS:
+                mongo_degraded.clear()
+        except Exception as e:
+            # Keep draining on the next round whatever went wrong; stopping here would
+            # leave mongo_degraded set and every later answer on disk only
+            print(f"Spool drain stopped, retrying in {SPOOL_DRAIN_SECONDS}s: {e}")
+            continue
+        if replayed:
+            print(f"Replayed {replayed} spooled responses")
+
+@app.on_event("startup")
+def start_spool_drainer():
+    # Also picks up segments left over from before a restart
+    if spool:
+        threading.Thread(target=drain_spool, name="spool-drainer", daemon=True).start()
+
+class GroupCommitBuffer:
+    # Collects submissions from concurrent requests and writes them with one bulk_write.
+    # submit() returns a Future that resolves once the batch holding the document has
+    # been written, so callers only acknowledge answers that are actually stored.
+    def __init__(self, max_docs: int, interval_ms: float):
+        self.max_docs = max_docs
+        self.interval = interval_ms / 1000
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.documents = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=1000)
+        self.batch_sizes = deque(maxlen=1000)
+
+    def submit(self, response_data: dict, question_marks: int):
+        future = Future()
+        self.pending.put((response_data, question_marks, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_docs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.flush(batch)
+
+    def flush(self, batch: list):
+        started = time.monotonic()
+        try:
+            inserted = store_responses([doc for doc, _, _ in batch], [marks for _, marks, _ in batch])
+        except Exception as e:
+            # The whole batch fails together; retrying is safe because submission is an upsert
+            for _, _, future in batch:
+                future.set_exception(e)
+            with self.lock:
+                self.failures += 1
+            return
+        for i, (_, _, future) in enumerate(batch):
+            future.set_result(inserted is None or i in inserted)
+        with self.lock:
+            self.flushes += 1
+            self.documents += len(batch)
+            self.latencies.append((time.monotonic() - started) * 1000)
+            self.batch_sizes.append(len(batch))
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            batch_sizes = list(self.batch_sizes)
+            summary = {
+                "flushes": self.flushes,
+                "documents": self.documents,
+                "failedFlushes": self.failures,
+                "queued": self.pending.qsize(),
+                "maxDocs": self.max_docs,
+                "intervalMs": self.interval * 1000
+            }
+        if latencies:
+            summary["flushLatencyMs"] = {
+                "p50": round(latencies[len(latencies) // 2], 2),
+                "p95": round(latencies[int(len(latencies) * 0.95)], 2),
+                "max": round(latencies[-1], 2)
+            }
+            summary["avgBatchSize"] = round(sum(batch_sizes) / len(batch_sizes), 1)
+        return summary
+
+group_commit = GroupCommitBuffer(GROUP_COMMIT_MAX_DOCS, GROUP_COMMIT_INTERVAL_MS) if GROUP_COMMIT else None
+
+@app.on_event("startup")
+def start_group_commit():
+    if group_commit:
+        threading.Thread(target=group_commit.run, name="group-commit", daemon=True).start()
+
+@app.get("/metrics/group-commit")
+def get_group_commit_metrics():
+    # Flush latencies and batch sizes cover the last 1000 flushes
+    if not group_commit:
+        return {"enabled": False}
+    return {"enabled": True, **group_commit.metrics()}
+
+def submit_answer(exam_id: str, question_id: str, student_id: str, answer: AnswerSubmit):
+    meta = get_exam_meta(exam_id)
+    if not meta or not is_exam_live(meta["exam"]):
+        raise HTTPException(status_code=404, detail="Exam not found or not live")
+
+    question = meta["questions"].get(str_to_objectid(question_id))
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    response_data = build_response(exam_id, question_id, student_id, answer, question)
+    if group_commit:
+        group_commit.submit(response_data, question.get("marks", 0)).result()
+        return {"message": "Response submitted successfully!"}
+    store_responses([response_data], [question.get("marks", 0)])
     return {"message": "Response submitted successfully!"}
 
+async def submit_answer_async(exam_id: str, question_id: str, student_id: str, answer: AnswerSubmit):
+    meta = await get_exam_meta_async(exam_id)
+    if not meta or not is_exam_live(meta["exam"]):
+        raise HTTPException(status_code=404, detail="Exam not found or not live")
+
+    question = meta["questions"].get(str_to_objectid(question_id))
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    response_data = build_response(exam_id, question_id, student_id, answer, question)
+    if group_commit:
+        await asyncio.wrap_future(group_commit.submit(response_data, question.get("marks", 0)))
+        return {"message": "Response submitted successfully!"}
+    await store_response_async(response_data, question.get("marks", 0))
+    return {"message": "Response submitted successfully!"}
+
+app.add_api_route(
+    "/exams/{exam_id}/questions/{question_id}/response",
+    submit_answer_async if USE_MOTOR else submit_answer,
+    methods=["POST"]
+)
+
+@app.post("/exams/{exam_id}/responses:batch")
+def submit_answers_batch(exam_id: str, batch: BatchSubmit):
+    meta = get_exam_meta(exam_id)
+    if not meta or not is_exam_live(meta["exam"]):
+        raise HTTPException(status_code=404, detail="Exam not found or not live")
+
+    question_ids = [str_to_objectid(a.questionId) for a in batch.answers]
+    if None in question_ids:
+        raise HTTPException(status_code=400, detail="Invalid question id in batch")
+    if len(set(question_ids)) != len(question_ids):
+        raise HTTPException(status_code=400, detail="Each question can only be answered once per batch")
+
+    questions = meta["questions"]
+
+    documents = []
+    for answer, question_id in zip(batch.answers, question_ids):
+        question = questions.get(question_id)
+        if not question:
+            raise HTTPException(status_code=404, detail=f"Question {answer.questionId} not found")
+        if answer.type != question.get("type"):
+            raise HTTPException(status_code=400, detail=f"Question {answer.questionId} is not of type {answer.type}")
+
+        response_data = {
+            "examId": exam_id,
+            "id": question_id,
+            "studentId": batch.studentId,
+            "type": answer.type
+        }
+        if answer.type == "long":
+            response_data["longAnswerText"] = answer.longAnswerText or ""
+            response_data["marksAwarded"] = None  # To be graded later by teacher
+        else:
+            if answer.selectedAnswerIndex is None:
+                raise HTTPException(status_code=400, detail=f"Missing selectedAnswerIndex for {answer.questionId}")
+            response_data["selectedAnswerIndex"] = answer.selectedAnswerIndex
+            # Auto-grade
+            if answer.selectedAnswerIndex == question.get("correctAnswerIndex"):
+                response_data["marksAwarded"] = question.get("marks", 0)
+            else:
+                response_data["marksAwarded"] = 0
+
+        documents.append(response_data)
+
+    if not documents:
+        return {"message": "Responses submitted successfully!", "submitted": 0, "duplicates": 0}
+
+    inserted = store_responses(documents, [questions[d["id"]].get("marks", 0) for d in documents])
+    if inserted is None:
+        # Spooled: accepted now, deduplicated when the drainer replays them
+        return {"message": "Responses submitted successfully!", "submitted": len(documents), "spooled": True}
+    return {
+        "message": "Responses submitted successfully!",
+        "submitted": len(inserted),
+        "duplicates": len(documents) - len(inserted)
+    }
+
 @app.get("/responses")
 def get_responses(student_id: str, exam_id: str):
     query = {"studentId": student_id, "examId": exam_id}
     responses = list(responses_collection.find(query))
 
+    # One round trip for every question the student answered
+    questions = {
+        q["_id"]: q
+        for q in questions_collection.find(
+            {"_id": {"$in": list({r["id"] for r in responses})}},
+            {"questionText": 1, "options": 1, "correctAnswerIndex": 1, "marks": 1}
+        )
+    }
+
     result = []
     for r in responses:
-        question = questions_collection.find_one({"_id": r["id"]})
+        question = questions.get(r["id"])
         if not question:
             continue
         if "selectedAnswerIndex" in r:
@@ -140,8 +637,13 @@ def get_responses_for_evaluation(exam_id: str, question_id: str):
 
 @app.get("/exams/question-responses")
 def get_responses_for_question(
+    response: Response,
     exam_id: str = Query(...),
-    question_id: str = Query(...)
+    question_id: str = Query(...),
+    graded: Optional[bool] = None,
+    summary: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None
 ):
     question = questions_collection.find_one({"_id": str_to_objectid(question_id), "examId": exam_id})
     if not question:
@@ -150,26 +652,159 @@ def get_responses_for_question(
     if question["type"] != "long":
         raise HTTPException(status_code=400, detail="Only long-format questions are evaluated manually.")
 
-    responses = responses_collection.find({
-        "examId": exam_id,
-        "id": str_to_objectid(question_id)
-    })
+    if after is not None and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+    query = {"examId": exam_id, "id": str_to_objectid(question_id)}
+    if graded is not None:
+        query["marksAwarded"] = {"$ne": None} if graded else None
+    if after is not None:
+        query["_id"] = {"$gt": ObjectId(after)}
+
+    # Summary pages leave out the answer bodies; fetch them with /responses/answers
+    projection = {"longAnswerText": 0} if summary else None
+    cursor = responses_collection.find(query, projection).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    responses = list(cursor)
+    if limit and len(responses) == limit:
+        response.headers["X-Next-After"] = str(responses[-1]["_id"])
+
+    # Without summary the bodies are already here, so ungraded answers that no auto-score
+    # run has reached get a suggestion computed inline. It is not stored; only
+    # POST /exams/{exam_id}/auto-score writes suggestions, and summary pages serve those
+    if not summary:
+        keywords = tuple(question.get("expectedKeywords") or [])
+        for resp in responses:
+            if resp.get("marksAwarded") is None and "suggestedMarks" not in resp:
+                resp["suggestedMarks"], resp["matchedKeywords"] = suggest(keywords, question.get("marks", 0), resp.get("longAnswerText", ""))
+
+    page = []
+    for resp in responses:
+        item = {
+            "responseId": str(resp["_id"]),
+            "studentId": str(resp["studentId"]),
+            "marksAwarded": resp.get("marksAwarded"),
+            "gradedBy": resp.get("gradedBy"),
+            "gradedAt": resp.get("gradedAt"),
+            "suggestedMarks": resp.get("suggestedMarks"),
+            "matchedKeywords": resp.get("matchedKeywords", [])
+        }
+        if not summary:
+            item["longAnswerText"] = resp.get("longAnswerText", "")
+        page.append(item)
 
     return {
         "questionText": question["questionText"],
         "expectedKeywords": question.get("expectedKeywords", []),
-        "responses": [
-            {
-                "responseId": str(resp["_id"]),
-                "studentId": str(resp["studentId"]),
-                "longAnswerText": resp.get("longAnswerText", ""),
-                "marksAwarded": resp.get("marksAwarded"),
-                "gradedBy": resp.get("gradedBy"),
-                "gradedAt": resp.get("gradedAt")
-            } for resp in responses
-        ]
+        "responses": page
+    }
+
+@app.get("/responses/answers")
+def get_answer_bodies(response_ids: List[str] = Query(...)):
+    # Answer bodies for one page of a summary listing, keyed by response id
+    if len(response_ids) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 response ids per request")
+    ids = [str_to_objectid(rid) for rid in response_ids]
+    if None in ids:
+        raise HTTPException(status_code=400, detail="Invalid response id")
+    return {
+        str(resp["_id"]): resp.get("longAnswerText", "")
+        for resp in responses_collection.find({"_id": {"$in": ids}}, {"longAnswerText": 1})
+    }
+
+scoring_pool = None
+
+def get_scoring_pool():
+    # Created on first use; only auto-score runs need the worker processes
+    global scoring_pool
+    if scoring_pool is None:
+        scoring_pool = ProcessPoolExecutor(max_workers=SCORING_WORKERS)
+    return scoring_pool
+
+@app.post("/exams/{exam_id}/auto-score")
+def auto_score_exam(exam_id: str):
+    # Stores a suggested mark and the matched keywords on every ungraded long answer
+    questions = {
+        q["_id"]: q
+        for q in questions_collection.find({"examId": exam_id, "type": "long"}, {"expectedKeywords": 1, "marks": 1})
+    }
+    if not questions:
+        return {"scored": 0}
+
+    pool = get_scoring_pool()
+    futures = []
+
+    def submit_chunk(question_id, answers):
+        question = questions[question_id]
+        keywords = tuple(question.get("expectedKeywords") or [])
+        futures.append(pool.submit(score_chunk, keywords, question.get("marks", 0), answers))
+
+    chunks = defaultdict(list)
+    responses = responses_collection.find(
+        {"examId": exam_id, "id": {"$in": list(questions)}, "marksAwarded": None},
+        {"id": 1, "longAnswerText": 1}
+    )
+    for resp in responses:
+        chunk = chunks[resp["id"]]
+        chunk.append((str(resp["_id"]), resp.get("longAnswerText", "")))
+        if len(chunk) >= SCORING_CHUNK_SIZE:
+            submit_chunk(resp["id"], chunk)
+            chunks[resp["id"]] = []
+    for question_id, chunk in chunks.items():
+        if chunk:
+            submit_chunk(question_id, chunk)
+
+    scored = 0
+    now = datetime.utcnow()
+    for future in as_completed(futures):
+        suggestions = future.result()
+        responses_collection.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(response_id), "marksAwarded": None},
+                {"$set": {"suggestedMarks": mark, "matchedKeywords": matched, "suggestedAt": now}}
+            )
+            for response_id, mark, matched in suggestions
+        ], ordered=False)
+        scored += len(suggestions)
+    return {"scored": scored}
+
+@app.get("/exams/{exam_id}/mcq-distribution")
+def get_mcq_distribution(exam_id: str):
+    # Answer counts for every MCQ of the exam from a single $group, keyed by question id
+    questions = {
+        q["_id"]: q
+        for q in questions_collection.find({"examId": exam_id, "type": "mcq"}, {"correctAnswerIndex": 1})
+    }
+    distribution = {
+        str(question_id): {"totalResponses": 0, "counts": {}, "percentCorrect": None}
+        for question_id in questions
     }
 
+    buckets = responses_collection.aggregate([
+        {"$match": {"examId": exam_id, "type": "mcq"}},
+        {"$group": {
+            "_id": {"question": "$id", "selected": "$selectedAnswerIndex"},
+            "count": {"$sum": 1}
+        }}
+    ])
+    correct = defaultdict(int)
+    for bucket in buckets:
+        question_id = bucket["_id"]["question"]
+        if question_id not in questions:
+            continue  # Question deleted after answers came in
+        entry = distribution[str(question_id)]
+        entry["totalResponses"] += bucket["count"]
+        entry["counts"][str(bucket["_id"].get("selected"))] = bucket["count"]
+        if bucket["_id"].get("selected") == questions[question_id].get("correctAnswerIndex"):
+            correct[question_id] += bucket["count"]
+
+    for question_id in questions:
+        entry = distribution[str(question_id)]
+        if entry["totalResponses"]:
+            entry["percentCorrect"] = round(100 * correct[question_id] / entry["totalResponses"], 1)
+    return distribution
+
 @app.get("/exams/question-responses/all")
 def get_all_mcq_responses(exam_id: str = Query(...), question_id: str = Query(...)):
     question = questions_collection.find_one({"_id": ObjectId(question_id)})
@@ -197,19 +832,101 @@ def get_all_mcq_responses(exam_id: str = Query(...), question_id: str = Query(..
 
 @app.post("/responses/grade")
 def grade_response(response_id: str = Query(...), marks: int = Body(...), gradedBy: str = Body(...)):
-    result = db.responses.update_one(
+    previous = db.responses.find_one_and_update(
         {"_id": ObjectId(response_id)},
         {"$set": {
             "marksAwarded": marks,  # ✅ Unified field name
             "gradedBy": gradedBy,
             "gradedAt": datetime.utcnow()
-        }}
+        }},
+        return_document=ReturnDocument.BEFORE
     )
 
-    if result.modified_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Response not found or already graded")
 
+    delta = marks - (previous.get("marksAwarded") or 0)
+    if delta:
+        add_to_running_total(previous["studentId"], previous["examId"], marks=delta)
+
     return {"message": "Response graded successfully!"}
 
+@app.post("/responses/grade:bulk")
+def grade_responses_bulk(payload: BulkGrade):
+    object_ids = [str_to_objectid(g.response_id) for g in payload.grades]
+    if len(set(g.response_id for g in payload.grades)) != len(payload.grades):
+        raise HTTPException(status_code=400, detail="Each response can only be graded once per request")
+    previous = {
+        r["_id"]: r
+        for r in responses_collection.find(
+            {"_id": {"$in": [oid for oid in object_ids if oid is not None]}},
+            {"studentId": 1, "examId": 1, "marksAwarded": 1}
+        )
+    }
+
+    # Each update only applies if the mark is still the one the delta was computed
+    # from; gradedAt/gradedBy tell afterwards which updates applied. BSON dates keep
+    # milliseconds only, so the timestamp is truncated to compare equal when read back
+    now = datetime.utcnow()
+    graded_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    statuses = []
+    writes = []
+    write_items = []
+    for i, (grade, oid) in enumerate(zip(payload.grades, object_ids)):
+        if oid is None or oid not in previous:
+            statuses.append({"response_id": grade.response_id, "success": False, "detail": "Response not found"})
+            continue
+        statuses.append({"response_id": grade.response_id, "success": True})
+        writes.append(UpdateOne(
+            {"_id": oid, "marksAwarded": previous[oid].get("marksAwarded")},
+            {"$set": {"marksAwarded": grade.marks, "gradedBy": payload.gradedBy, "gradedAt": graded_at}}
+        ))
+        write_items.append(i)
+
+    failed = set()
+    if writes:
+        try:
+            matched = responses_collection.bulk_write(writes, ordered=False).matched_count
+        except BulkWriteError as e:
+            matched = e.details.get("nMatched", 0)
+            for error in e.details.get("writeErrors", []):
+                item = write_items[error["index"]]
+                failed.add(item)
+                statuses[item].update(success=False, detail=error.get("errmsg", "Write failed"))
+
+        if matched < len(write_items) - len(failed):
+            applied = {
+                r["_id"]
+                for r in responses_collection.find(
+                    {"_id": {"$in": [object_ids[i] for i in write_items]}, "gradedAt": graded_at, "gradedBy": payload.gradedBy},
+                    {"_id": 1}
+                )
+            }
+            for i in write_items:
+                if i not in failed and object_ids[i] not in applied:
+                    failed.add(i)
+                    statuses[i].update(success=False, conflict=True, detail="Response was graded by someone else; reload and try again")
+
+    # Keep the running totals in step with the marks that were actually written
+    deltas = defaultdict(int)
+    for i in write_items:
+        if i in failed:
+            continue
+        before = previous[object_ids[i]]
+        deltas[(before["studentId"], before["examId"])] += payload.grades[i].marks - (before.get("marksAwarded") or 0)
+    totals = [
+        UpdateOne(*running_total_update(student_id, exam_id, marks=delta), upsert=True)
+        for (student_id, exam_id), delta in deltas.items() if delta
+    ]
+    if totals:
+        running_totals_collection.bulk_write(totals, ordered=False)
+
+    return {
+        "graded": sum(1 for item in statuses if item["success"]),
+        "failed": sum(1 for item in statuses if not item["success"]),
+        "conflicts": sum(1 for item in statuses if item.get("conflict")),
+        "results": statuses
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8004, reload=True)
\ No newline at end of file
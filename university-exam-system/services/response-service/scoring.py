@@ -0,0 +1,115 @@
+"""
+Keyword auto-scoring for long answers.
+
+Each long question's expectedKeywords are normalized, stemmed and compiled
+into a word-level Aho-Corasick automaton, so an answer is scored in a single
+pass over its words however many keywords there are. Multi-word keywords
+("binary search tree") match as phrases. The suggested mark is the question's
+marks scaled by the fraction of keywords found. It is only a suggestion;
+teachers still award the final mark.
+"""
+from collections import deque
+from functools import lru_cache
+import re
+import unicodedata
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# (suffix, replacement), longest first; the first one that leaves a stem of 3+ letters wins
+SUFFIX_RULES = [
+    ("ational", "ate"), ("tional", "tion"), ("ization", "ize"), ("fulness", "ful"),
+    ("ousness", "ous"), ("iveness", "ive"), ("ations", "ate"), ("ation", "ate"),
+    ("ments", ""), ("ment", ""), ("ness", ""), ("ings", ""), ("ing", ""),
+    ("ies", "y"), ("ied", "y"), ("edly", ""), ("ed", ""), ("ly", ""),
+    ("sses", "ss"), ("ches", "ch"), ("shes", "sh"), ("xes", "x"), ("zes", "z"), ("s", ""),
+]
+
+def normalize(text: str):
+    # Lowercase words with accents folded away
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return WORD.findall(text.lower())
+
+@lru_cache(maxsize=65536)
+def stem(word: str):
+    # A small suffix stripper in the spirit of Porter's; it only needs to map keyword
+    # and answer forms to the same stem, not produce dictionary words
+    for suffix, replacement in SUFFIX_RULES:
+        if not word.endswith(suffix):
+            continue
+        if suffix == "s" and word.endswith(("ss", "us", "is")):
+            break
+        base = word[:len(word) - len(suffix)]
+        if len(base) + len(replacement) < 3:
+            break
+        word = base + replacement
+        if suffix in ("ing", "ings", "ed", "edly") and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+            word = word[:-1]  # running -> run
+        break
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]  # database/databases -> databas
+    return word
+
+def tokens(text: str):
+    return [stem(word) for word in normalize(text)]
+
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self.keywords = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword in keywords:
+            words = tokens(keyword)
+            if not words or keyword in self.keywords:
+                continue
+            index = len(self.keywords)
+            self.keywords.append(keyword)
+            state = 0
+            for word in words:
+                nxt = self.goto[state].get(word)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][word] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(index)
+
+        # Breadth-first failure links; each state inherits the outputs of its failure state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(word, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def matches(self, text: str):
+        found = set()
+        state = 0
+        for word in tokens(text):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            found.update(self.output[state])
+        return [self.keywords[i] for i in sorted(found)]
+
+@lru_cache(maxsize=1024)
+def automaton_for(keywords: tuple):
+    # Built once per keyword list (per process when scoring runs in the pool)
+    return KeywordAutomaton(keywords)
+
+def suggest(keywords: tuple, marks: int, text: str):
+    automaton = automaton_for(keywords)
+    matched = automaton.matches(text)
+    if not automaton.keywords:
+        return 0, matched
+    return round(marks * len(matched) / len(automaton.keywords)), matched
+
+def score_chunk(keywords: tuple, marks: int, answers: list):
+    # Process pool entry point: answers is [(response_id, text)], returns [(response_id, mark, matched)]
+    return [(response_id, *suggest(keywords, marks, text)) for response_id, text in answers]
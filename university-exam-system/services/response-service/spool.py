@@ -0,0 +1,196 @@
+"""
+Local append-only spool for answers that could not be written to MongoDB.
+
+response-service appends submissions here while Mongo is failing or slow, and a
+background drainer replays them into `responses` once it recovers. The spool is
+a directory of numbered JSONL segments (segment-00000001.jsonl, ...). Each line
+is one response in MongoDB extended JSON, together with the marks of its
+question so replay can update running totals. Replay is safe to repeat because
+responses are upserted on (examId, studentId, id).
+
+Usage:
+    python spool.py inspect [--dir /app/spool]
+    python spool.py replay [--dir /app/spool] [--segment segment-00000001.jsonl] [--batch-size 500] [--include-active]
+"""
+from bson import json_util
+from datetime import datetime
+import argparse
+import os
+import threading
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+class Spool:
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        segments = self.segments()
+        self.sequence = int(segments[-1][len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) if segments else 0
+        self.file = None  # Opened on the first append, so reading never creates segments
+        self.written = 0  # Appends written to the OS so far
+        self.synced = 0   # Appends known to be on disk
+
+    def segments(self):
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def open_segment(self):
+        # Always starts a new segment so sealed ones are never appended to again
+        self.sequence += 1
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.sequence:08d}{SEGMENT_SUFFIX}")
+        self.file = open(path, "a", encoding="utf-8")
+        # Make the new directory entry durable too
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def append(self, documents: list, question_marks: list):
+        lines = "".join(
+            json_util.dumps({"response": doc, "questionMarks": marks, "spooledAt": datetime.utcnow()}) + "\n"
+            for doc, marks in zip(documents, question_marks)
+        )
+        with self.lock:
+            if self.file is None:
+                self.open_segment()
+            self.file.write(lines)
+            self.file.flush()
+            self.written += 1
+            ticket = self.written
+            if self.file.tell() >= self.segment_bytes:
+                self.seal()
+        self.sync(ticket)
+
+    def sync(self, ticket: int):
+        # Group fsync: whoever takes sync_lock first fsyncs on behalf of every append
+        # written before it, and the callers queued behind it find their ticket covered
+        with self.sync_lock:
+            if self.synced >= ticket:
+                return
+            with self.lock:
+                file, covered = self.file, self.written
+            if file is not None:
+                try:
+                    os.fsync(file.fileno())
+                except ValueError:
+                    pass  # Sealed meanwhile, and seal() already fsynced it
+            self.synced = max(self.synced, covered)
+
+    def seal(self):
+        # Caller holds self.lock; the next append starts a new segment
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+
+    def sealed_segments(self):
+        # Seals the active segment so everything appended so far can be drained
+        with self.lock:
+            if self.file is not None:
+                self.seal()
+            return self.segments()
+
+    def read(self, name: str, quarantine: bool = True):
+        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Torn final line from a crash mid-append; it was never acknowledged
+                try:
+                    record = json_util.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or "response" not in record:
+                    if quarantine:
+                        self.reject(name, line)
+                    continue
+                yield record
+
+    def reject(self, name: str, line: str):
+        # Corrupt lines are kept next to the segment for inspection instead of blocking replay
+        with open(os.path.join(self.directory, name + ".rejected"), "a", encoding="utf-8") as f:
+            f.write(line)
+        print(f"Spool: moved a corrupt line of {name} to {name}.rejected")
+
+    def set_aside(self, name: str, error: Exception):
+        # A segment that cannot be read at all is renamed so the drainer stops retrying it
+        path = os.path.join(self.directory, name)
+        os.replace(path, path + ".unreadable")
+        print(f"Spool: set {name} aside as {name}.unreadable: {error}")
+
+    def replay(self, name: str, write, batch_size: int = 500):
+        # Writes one segment back through `write(documents, question_marks)` and deletes it
+        documents, marks = [], []
+        replayed = 0
+        for record in self.read(name):
+            documents.append(record["response"])
+            marks.append(record.get("questionMarks", 0))
+            if len(documents) >= batch_size:
+                write(documents, marks)
+                replayed += len(documents)
+                documents, marks = [], []
+        if documents:
+            write(documents, marks)
+            replayed += len(documents)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass  # Replayed concurrently by `spool.py replay`
+        return replayed
+
+    def drain(self, write, batch_size: int = 500):
+        replayed = 0
+        for name in self.sealed_segments():
+            try:
+                replayed += self.replay(name, write, batch_size)
+            except FileNotFoundError:
+                continue
+            except (OSError, UnicodeDecodeError) as e:
+                self.set_aside(name, e)
+        return replayed
+
+def inspect(spool: Spool):
+    segments = spool.segments()
+    if not segments:
+        print("Spool is empty")
+        return
+    total = 0
+    for name in segments:
+        records = list(spool.read(name, quarantine=False))
+        total += len(records)
+        size = os.path.getsize(os.path.join(spool.directory, name))
+        span = ""
+        if records:
+            span = f"  {records[0]['spooledAt']:%Y-%m-%d %H:%M:%S} .. {records[-1]['spooledAt']:%Y-%m-%d %H:%M:%S}"
+        print(f"{name}  {len(records):>7} responses  {size:>10} bytes{span}")
+    print(f"{len(segments)} segments, {total} responses")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay the response-service spool")
+    parser.add_argument("command", choices=["inspect", "replay"])
+    parser.add_argument("--dir", default=os.getenv("SPOOL_DIR", "/app/spool"), help="spool directory")
+    parser.add_argument("--segment", help="replay only this segment")
+    parser.add_argument("--batch-size", type=int, default=500, help="responses per bulk_write")
+    parser.add_argument("--include-active", action="store_true", help="also replay the newest segment (only when response-service is stopped)")
+    args = parser.parse_args()
+
+    spool = Spool(args.dir)
+    if args.command == "inspect":
+        inspect(spool)
+        return
+
+    from main import write_responses  # Only replay needs the Mongo connection
+    names = [args.segment] if args.segment else spool.segments()
+    if not args.segment and not args.include_active:
+        names = names[:-1]  # A running response-service may still be appending to the newest one
+    for name in names:
+        print(f"{name}: replayed {spool.replay(name, write_responses, args.batch_size)} responses")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+GET /responses must load its questions with a constant number of queries.
+
+Runs without MongoDB: pip install -r requirements.txt pytest && python -m pytest tests
+"""
+import os
+import sys
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+class CountingCollection:
+    # Just enough of a pymongo collection for get_responses, counting every query
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+
+    def matches(self, doc, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict) and "$in" in condition:
+                if doc.get(field) not in condition["$in"]:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        self.queries += 1
+        return [doc for doc in self.docs if self.matches(doc, query)]
+
+    def find_one(self, query, projection=None):
+        self.queries += 1
+        return next(iter(self.find(query)), None)
+
+
+def query_count(monkeypatch, n_responses):
+    questions = [
+        {"_id": ObjectId(), "questionText": f"Q{i}", "options": ["a", "b"], "correctAnswerIndex": 0, "marks": 2}
+        for i in range(n_responses)
+    ]
+    responses = [
+        {"_id": ObjectId(), "examId": "exam-1", "studentId": "student1", "id": q["_id"], "selectedAnswerIndex": 0, "marksAwarded": 2}
+        for q in questions
+    ]
+    responses_collection = CountingCollection(responses)
+    questions_collection = CountingCollection(questions)
+    monkeypatch.setattr(main, "responses_collection", responses_collection)
+    monkeypatch.setattr(main, "questions_collection", questions_collection)
+
+    result = main.get_responses(student_id="student1", exam_id="exam-1")
+
+    assert len(result) == n_responses
+    return responses_collection.queries + questions_collection.queries
+
+
+def test_query_count_does_not_grow_with_responses(monkeypatch):
+    assert query_count(monkeypatch, 1) == query_count(monkeypatch, 50)
@@ -1,9 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from typing import Optional
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import re
 import uvicorn
 
+try:
+    from index_bootstrap import apply_index_manifest  # Mounted by docker-compose with data/indexes.json
+except ImportError:
+    apply_index_manifest = None
+
+
 # MongoDB Setup
 mongo_url = os.getenv("MONGO_URL", "mongodb://mongodb:27017")
 client = MongoClient(mongo_url)
@@ -16,17 +24,48 @@ questions_collection = db.questions
 classes_collection = db.classes
 responses_collection = db.responses
 results_collection = db.results
+counters_collection = db.counters
 
 app = FastAPI()
 
+# Collections whose manifest indexes this service maintains (see data/index_bootstrap.py)
+INDEX_COLLECTIONS = ("students", "teachers")
+
+@app.on_event("startup")
+def ensure_indexes():
+    if apply_index_manifest is None:
+        print("index_bootstrap.py is not mounted; skipping index bootstrap")
+        return
+    apply_index_manifest(db, INDEX_COLLECTIONS)
+
+def reserve_ids(counter: str, collection, prefix: str):
+    # Atomically claims the next sequence number for IDs of the form <prefix><n>
+    update = {"$inc": {"seq": 1}}
+    doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    if doc is None:
+        # First use of this counter: continue after the highest ID that already exists
+        pattern = re.compile(f"^{re.escape(prefix)}(\\d+)$")
+        existing = 0
+        for d in collection.find({"_id": {"$regex": pattern.pattern}}, {"_id": 1}):
+            existing = max(existing, int(pattern.match(d["_id"]).group(1)))
+        try:
+            counters_collection.insert_one({"_id": counter, "seq": existing})
+        except DuplicateKeyError:
+            pass
+        doc = counters_collection.find_one_and_update({"_id": counter}, update, return_document=ReturnDocument.AFTER)
+    return doc["seq"]
+
+def bump_enrollment_version():
+    # Lets exam-service invalidate its cached student -> subject mapping
+    db.config.update_one({"_id": "enrollment_version"}, {"$inc": {"version": 1}}, upsert=True)
+
 @app.post("/students")
 def create_student(name: str, email: str, classId: str, password: str, rollNumber: Optional[str] = None):
     if students_collection.find_one({"email": email}):
         raise HTTPException(status_code=400, detail="Student with this email already exists")
 
     base_id = "student"
-    existing = list(students_collection.find({"_id": {"$regex": f"^{base_id}"}}))
-    student_id = f"{base_id}{len(existing)+1}"
+    student_id = f"{base_id}{reserve_ids('students', students_collection, base_id)}"
 
     student = {
         "_id": student_id,
@@ -38,6 +77,7 @@ def create_student(name: str, email: str, classId: str, password: str, rollNumbe
         "courseIds": []
     }
     students_collection.insert_one(student)
+    bump_enrollment_version()
     return {"message": f"Student '{name}' created with ID '{student_id}'!"}
 
 @app.post("/teachers")
@@ -46,8 +86,7 @@ def create_teacher(name: str, email: str, password: str):
         raise HTTPException(status_code=400, detail="Teacher with this email already exists")
 
     base_id = "teacher"
-    existing = list(teachers_collection.find({"_id": {"$regex": f"^{base_id}"}}))
-    teacher_id = f"{base_id}{len(existing)+1}"
+    teacher_id = f"{base_id}{reserve_ids('teachers', teachers_collection, base_id)}"
 
     teacher = {
         "_id": teacher_id,
@@ -95,6 +134,7 @@ def delete_student(student_id: str):
     if not students_collection.find_one({"_id": student_id}):
         raise HTTPException(status_code=404, detail="Student not found")
     students_collection.delete_one({"_id": student_id})
+    bump_enrollment_version()
     return {"message": "Student deleted successfully!"}
 
 @app.delete("/teachers/{teacher_id}")